@@ -0,0 +1,235 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.Model import HIOM
+from src.kernels import numba_available
+from src.stats import compute_hartigan_opinions, compute_fractions_size, compute_mean_opinion
+from scenarios.test import agents
+
+"""
+Benchmarks of the hot paths of HIOM: model construction for every network topology, choice of the
+active agent, a single Agent.step, one full HIOM.step of every engine, data collection and the
+functions of src/stats.py, for a range of population sizes. Every benchmark reports the time per
+call and the peak memory allocated during a call (tracemalloc, measured in a separate call).
+
+Usage (from the repository root):
+    python benchmarks/benchmark.py --sizes 200 4039 100000 --output results.json
+    python benchmarks/benchmark.py --output new.json --baseline results.json --tolerance 0.2
+
+With --baseline every benchmark is compared with the stored results and the script exits with
+status 1 if any of them got slower by more than the tolerance.
+"""
+
+facebook_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "facebook_combined.txt")
+facebook_size = 4039
+
+# population sizes above which the benchmarks become too slow to be useful
+size_limits = {
+    "init_networkx": 5000,
+    "agent": 5000,
+    "datacollector": 100000,
+    "hartigan": 5000
+}
+
+
+def scaled_agents(n):
+    """
+    Agent types of scenarios/test.py scaled to a population of n, keeping their proportions.
+    """
+    total = sum(atype["n"] for atype in agents)
+    counts = [int(round(n * atype["n"] / total)) for atype in agents]
+    counts[-1] = n - sum(counts[:-1])
+    return [dict(atype, n=count) for atype, count in zip(agents, counts)]
+
+
+def topologies(n):
+    """
+    Network parameters of every topology of src/Network.py for a population of n,
+    sparse graphs with mean degree of about 10 unless n is small.
+    """
+    blocks = 10
+    block = n // blocks
+    params = {
+        "er": {"method": "er", "p": min(0.1, 10 / n)},
+        "ba": {"method": "ba", "m": 5},
+        "ws": {"method": "ws", "k": 10, "p": 0.1},
+        "sb": {"method": "sb", "n_blocks": blocks, "p": min(0.01, 2 / n), "k": min(0.5, 8 / block)},
+        # the lattice has m rows of population nodes, more than there are agents unless m = 1
+        "lattice": {"method": "lattice", "m": 1}
+    }
+    if n == facebook_size:
+        params["social_media"] = {"method": "social_media", "path": facebook_path}
+    return params
+
+
+def measure(function, min_time=0.2, max_calls=1000, warmup=True):
+    """
+    Function to measure time per call and peak memory of a call.
+
+    Returns
+    -------
+    (seconds, peak_bytes, calls) : tuple
+        Median time per call, peak memory allocated during a single call, number of timed calls
+    """
+    if warmup:
+        function()
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_calls and (not times or time.perf_counter() - start < min_time):
+        call_start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - call_start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(times)), int(peak), len(times)
+
+
+def model_factory(n, network_params, **params):
+    return lambda: HIOM(scaled_agents(n), network_params=network_params, seed=0, **params)
+
+
+def benchmarks(n):
+    """
+    Function to list the benchmarks for a population of n.
+
+    Returns
+    -------
+    benchmarks : [ (string, function, dict) ]
+        Name, benchmarked function and keyword arguments of measure
+    """
+    suite = []
+    backends = ["networkx", "numpy"] if n <= size_limits["init_networkx"] else ["numpy"]
+    for name, network_params in topologies(n).items():
+        for backend in backends:
+            if name == "social_media" and backend == "numpy":
+                continue
+            params = dict(network_params, backend=backend)
+            headless = backend == "numpy"
+            suite.append(("init/{}/{}".format(name, backend),
+                          model_factory(n, params, engine="vectorized", headless=headless),
+                          {"warmup": False, "max_calls": 5}))
+
+    # the other benchmarks share one model, its copies record only their first step
+    network_params = dict(topologies(n)["er"], backend="numpy")
+    quiet = {"method": "array", "every": 10 ** 9}
+    model = model_factory(n, network_params, engine="vectorized", headless=True, recorder_params=quiet)()
+    for selection in ["linear", "sumtree"]:
+        selected = model.fork(selection=selection, recorder_params=quiet)
+        suite.append(("choose_agent/" + selection, selected.choose_agent, {}))
+
+    engines = ["vectorized"]
+    if numba_available:
+        engines.append("numba")
+    if n <= size_limits["agent"]:
+        engines.append("agent")
+        agent_model = model.fork(headless=False, recorder_params=quiet)
+        agent = agent_model.agent_list[0]
+        suite.append(("agent_step", agent.step, {}))
+    for engine in engines:
+        engine_model = model.fork(engine=engine, recorder_params=quiet)
+        if engine == "numba":
+            # the compiled engine runs many steps per call, the time is divided by them
+            suite.append(("step/numba_100", lambda m=engine_model: m.run_model(100), {}))
+        else:
+            suite.append(("step/" + engine, engine_model.step, {}))
+
+    recorders = [{"method": "array"}]
+    if n <= size_limits["datacollector"]:
+        recorders.append({"method": "datacollector"})
+    for recorder_params in recorders:
+        recording = model.fork(recorder_params=recorder_params)
+        suite.append(("collect/" + recorder_params["method"], recording.collect, {"max_calls": 200}))
+
+    stat_functions = [compute_fractions_size, compute_mean_opinion]
+    if n <= size_limits["hartigan"]:
+        stat_functions.append(compute_hartigan_opinions)
+    for stat_function in stat_functions:
+        suite.append(("stats/" + stat_function.__name__,
+                      lambda f=stat_function: f(model.opinions), {}))
+    return suite
+
+
+def run(sizes, only=None):
+    results = []
+    for n in sizes:
+        for name, function, options in benchmarks(n):
+            if only is not None and not any(name.startswith(prefix) for prefix in only):
+                continue
+            seconds, peak, calls = measure(function, **options)
+            if name == "step/numba_100":
+                name, seconds = "step/numba", seconds / 100
+            results.append({"name": name, "n": n, "seconds": seconds, "peak_bytes": peak, "calls": calls})
+            print("{:<36} n={:<8} {:>12.6f} s {:>12.1f} KiB".format(name, n, seconds, peak / 1024))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Function to compare results with a baseline.
+
+    Returns
+    -------
+    regressions : [ dict ]
+        Benchmarks which are slower than in the baseline by more than the tolerance (a fraction)
+    """
+    reference = {(result["name"], result["n"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        key = (result["name"], result["n"])
+        if key not in reference:
+            continue
+        ratio = result["seconds"] / reference[key]["seconds"]
+        memory_ratio = result["peak_bytes"] / max(reference[key]["peak_bytes"], 1)
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print("{:<36} n={:<8} time x{:.2f}  memory x{:.2f}  {}".format(key[0], key[1], ratio, memory_ratio, flag))
+        if flag:
+            regressions.append(dict(result, ratio=ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the hot paths of HIOM")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, facebook_size, 100000, 1000000],
+                        help="population sizes, 4039 adds the Facebook network")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose names start with these prefixes")
+    parser.add_argument("--output", default="benchmark_results.json", help="file the results are written to")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.only)
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {
+                "date": datetime.datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "numba": numba_available
+            },
+            "results": results
+        }, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("{} benchmarks got slower by more than {:.0%}".format(len(regressions), args.tolerance))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
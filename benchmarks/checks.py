@@ -0,0 +1,114 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.Model import HIOM
+
+"""
+Regression checks of the engines which are not statistical comparisons (see src/validation.py for
+those): every check runs a few small models and returns a table with a boolean "ok" column.
+
+Usage (from the repository root):
+    python benchmarks/checks.py
+    python benchmarks/checks.py --only snapshot_steps profiled_phases
+
+The script prints the tables and exits with status 1 if any row of any check failed.
+"""
+
+
+def snapshot_steps(engines=("numba", "partitioned"), reference="vectorized", calls=(15, 15), every=10,
+                   check_every=7, seed=0):
+    """
+    Engines running many steps per call have to take their snapshots at the same steps as the
+    reference engine, also when run_model is called several times. Compares the steps of the
+    online statistics, the number of recorded snapshots and the steps at which calls with a
+    stopping criterion holding at its first check (every check_every steps) ended.
+    """
+    stopping = {"every": check_every, "attention_below": np.inf}
+    rows = []
+    for engine in [reference] + list(engines):
+        params = {"engine": engine, "headless": True, "seed": seed,
+                  "recorder_params": {"method": "array", "every": every},
+                  "online_stats": {"every": every}}
+        if engine == "partitioned":
+            params["partition_params"] = {"shards": 2}
+        model = HIOM(**params)
+        for step_count in calls:
+            model.run_model(step_count)
+        stopped = HIOM(**params)
+        stop_steps = []
+        for step_count in calls:
+            stopped.run_model(step_count, stopping=stopping)
+            stop_steps.append(stopped.stop_step)
+        rows.append({
+            "engine": engine,
+            "snapshot_steps": list(model.online_stats.steps),
+            "snapshots": model.data_collector.size,
+            "stop_steps": stop_steps
+        })
+        model.close()
+        stopped.close()
+    comparison = pd.DataFrame(rows)
+    expected = rows[0]
+    comparison["ok"] = [all(row[name] == expected[name] for name in ("snapshot_steps", "snapshots", "stop_steps"))
+                        for row in rows]
+    return comparison
+
+
+def profiled_phases(step_count=50, seed=0):
+    """
+    The interactions of every engine have to be timed in the interact phase of the profiler and
+    not in the update of the population, also the array interactions of steps with several
+    interactions and of the partitioned engine.
+    """
+    configs = {
+        "vectorized": {"engine": "vectorized"},
+        "batched": {"engine": "vectorized", "interactions_per_step": 4},
+        "partitioned": {"engine": "partitioned", "partition_params": {"shards": 2}}
+    }
+    rows = []
+    for name, params in configs.items():
+        model = HIOM(headless=True, seed=seed, profile=True, **params)
+        model.run_model(step_count)
+        model.close()
+        report = model.profiler.report()
+        rows.append({
+            "config": name,
+            "interact_calls": report["interact"]["calls"],
+            "interact_seconds": report["interact"]["seconds"],
+            "update_seconds": report["update"]["seconds"],
+            "ok": report["interact"]["calls"] > 0 and report["interact"]["seconds"] > 0
+        })
+    return pd.DataFrame(rows)
+
+
+checks = {
+    "snapshot_steps": snapshot_steps,
+    "profiled_phases": profiled_phases
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression checks of the engines of HIOM")
+    parser.add_argument("--only", nargs="+", choices=list(checks), help="run only these checks")
+    args = parser.parse_args()
+
+    failed = []
+    for name in args.only or list(checks):
+        table = checks[name]()
+        print(name)
+        print(table.to_string(index=False))
+        if not table["ok"].all():
+            failed.append(name)
+    if failed:
+        print("Failed checks: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,10 @@ import numpy as np
 import scipy.stats as stats
 
 
-def first_type():
-    attention = 0.01 * np.random.random()
+# generators receive the random generator of the model (np.random.Generator),
+# drawing only from it makes the runs reproducible for a given seed
+def first_type(rng=np.random):
+    attention = 0.01 * rng.random()
     opinion = 0
     lower, upper = -0.1, 0.1
     mu, sigma = 0, 1
@@ -12,7 +14,7 @@ def first_type():
         (upper - mu) / sigma,
         loc=mu,
         scale=sigma
-    ).rvs(1)[0]
+    ).rvs(1, random_state=rng)[0]
     return {
         "attention": attention,
         "opinion": opinion,
@@ -20,8 +22,25 @@ def first_type():
     }
 
 
-def second_type():
-    attention = np.random.uniform(0, 0.5)
+def first_type_batch(n, rng=np.random):
+    # same as first_type, but for n agents at once
+    lower, upper = -0.1, 0.1
+    mu, sigma = 0, 1
+    information = stats.truncnorm(
+        (lower - mu) / sigma,
+        (upper - mu) / sigma,
+        loc=mu,
+        scale=sigma
+    ).rvs(n, random_state=rng)
+    return {
+        "attention": 0.01 * rng.random(n),
+        "opinion": np.zeros(n),
+        "information": information
+    }
+
+
+def second_type(rng=np.random):
+    attention = rng.uniform(0, 0.5)
     opinion = 1
     information = 1
     return {
@@ -31,15 +50,28 @@ def second_type():
     }
 
 
+def second_type_batch(n, rng=np.random):
+    # same as second_type, but for n agents at once
+    return {
+        "attention": rng.uniform(0, 0.5, n),
+        "opinion": np.ones(n),
+        "information": np.ones(n)
+    }
+
+
 # a set of agents is initialized for a simulation
 # more classes of agents can be added (1 class min)
+# "batch_generator" is optional, if present it is used
+# instead of calling "generator" for every agent
 agents = [
     {
         "n": 200,
-        "generator": first_type
+        "generator": first_type,
+        "batch_generator": first_type_batch
     },
     {
         "n": 10,
-        "generator": second_type
+        "generator": second_type,
+        "batch_generator": second_type_batch
     }
 ]
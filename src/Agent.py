@@ -1,20 +1,47 @@
 from mesa import Agent as MesaAgent
+import inspect
 import numpy as np
 
 
 class Agent(MesaAgent):
 
-    def __init__(self, model, unique_id, graph_id, neighbours, generator):
+    def __init__(self, model, unique_id, graph_id, neighbours, generator, index):
         super().__init__(unique_id, model)
         self.graph_id = graph_id
-        self.opinion = None
-        self.attention = None
-        self.information = None
-        self.init_character(generator)
+        # position of the agent in the state arrays of the model,
+        # opinion, attention and information are stored there
+        self.index = index
+        # without a generator the character was already set by the model
+        if generator is not None:
+            self.init_character(generator)
         self.neighbours = neighbours
 
+    @property
+    def opinion(self):
+        return self.model.opinions[self.index]
+
+    @opinion.setter
+    def opinion(self, value):
+        self.model.opinions[self.index] = value
+
+    @property
+    def attention(self):
+        return self.model.attentions[self.index]
+
+    @attention.setter
+    def attention(self, value):
+        self.model.attentions[self.index] = value
+
+    @property
+    def information(self):
+        return self.model.informations[self.index]
+
+    @information.setter
+    def information(self, value):
+        self.model.informations[self.index] = value
+
     def init_character(self, generator):
-        character = generator()
+        character = generate_character(generator, self.model.rng)
         self.opinion = character["opinion"]
         self.attention = character["attention"]
         self.information = character["information"]
@@ -24,17 +51,24 @@ class Agent(MesaAgent):
         has_neighbours = len(self.neighbours) > 0
         # active agents picks a random neighbour and interacts
         if is_active and has_neighbours:
-            chosen_id = np.random.choice(self.neighbours)
-            chosen_neighbour = None
-            for agent in self.model.schedule.agents:
-                if chosen_id == agent.graph_id:
-                    chosen_neighbour = agent
-            self.interact(chosen_neighbour)
-        # attention decays and opinion is reformulated
-        self.update_attention()
-        self.update_opinion()
+            self.interact(self.choose_neighbour())
+        # attention decays and opinion is reformulated on python floats,
+        # which are written back to the state arrays once
+        model = self.model
+        attention = self._decayed_attention(model.attentions.item(self.index))
+        model.attentions[self.index] = attention
+        model.opinions[self.index] = self._reformulated_opinion(
+            model.opinions.item(self.index), attention, model.informations.item(self.index)
+        )
+
+    def choose_neighbour(self):
+        # neighbours are looked up in the CSR arrays of the model,
+        # so both sampling and resolving the agent are O(1)
+        chosen_index = self.model.graph.random_neighbour(self.index, self.model.rng)
+        return self.model.agent_list[chosen_index]
 
     def interact(self, chosen_neighbour):
+        self.model.last_interaction = (self.index, chosen_neighbour.index)
         # attention of both agents is increased
         self.increase_attention()
         chosen_neighbour.increase_attention()
@@ -42,12 +76,15 @@ class Agent(MesaAgent):
         chosen_neighbour.update_information(self)
 
     def update_opinion(self):
+        self.opinion = self._reformulated_opinion(self.opinion, self.attention, self.information)
+
+    def _reformulated_opinion(self, opinion, attention, information):
         d_opinion = - (
-                np.power(self.opinion, 3) -
-                (self.attention - self.model.a_min) * self.opinion -
-                self.information
-        ) * self.model.dt + np.random.normal(0, self.model.sd_opinion) * self.model.dt
-        self.opinion += d_opinion
+                np.power(opinion, 3) -
+                (attention - self.model.a_min) * opinion -
+                information
+        ) * self.model.dt + self.model.rng.normal(0, self.model.sd_opinion) * self.model.dt
+        return opinion + d_opinion
 
     def update_information(self, neighbour):
         expo = np.exp(-self.model.persuasion * (self.attention - neighbour.attention))
@@ -55,13 +92,35 @@ class Agent(MesaAgent):
         r = self.model.r_min + frac
         self.information = r * self.information \
             + (1-r) * neighbour.information \
-            + np.random.normal(0, self.model.sd_info)
+            + self.model.rng.normal(0, self.model.sd_info)
 
     def increase_attention(self):
         d_attention = self.model.attention_delta * (2 - self.attention)
         self.attention += d_attention
 
     def update_attention(self):
+        self.attention = self._decayed_attention(self.attention)
+
+    def _decayed_attention(self, attention):
         frac = self.model.attention_delta / self.model.population # np.power(self.model.population, 2)
-        d_attention = - 2 * frac * self.attention
-        self.attention += d_attention
+        d_attention = - 2 * frac * attention
+        return attention + d_attention
+
+
+def generate_character(generator, rng):
+    # generators taking an argument draw from the random generator of the model,
+    # generators without arguments are still supported but are not reproducible
+    if len(inspect.signature(generator).parameters) > 0:
+        return generator(rng)
+    return generator()
+
+
+def generate_characters(atype, n, rng):
+    # a batch generator returns arrays of attention, opinion and information
+    # for all n agents of the type at once, otherwise the scalar generator
+    # is called for every agent
+    if "batch_generator" in atype:
+        return atype["batch_generator"](n, rng)
+    characters = [generate_character(atype["generator"], rng) for _ in range(n)]
+    return {key: np.array([character[key] for character in characters], dtype=np.float64)
+            for key in ("opinion", "attention", "information")}
@@ -0,0 +1,151 @@
+import numpy as np
+
+from .Agent import generate_characters
+from .Network import Network
+from .dynamics import decay_attention, update_opinions
+
+import sys
+sys.path.append('../')
+
+from scenarios.test import agents
+
+
+class Ensemble:
+    """
+    Many independent replicas of the same HIOM configuration advanced together.
+
+    The state of R replicas is kept in (R, N) arrays sharing a single network. Every step each
+    replica chooses its own active agent and neighbour, and interactions, attention decay and
+    opinion updates of all replicas are done with one vectorized operation each. The dynamics of
+    a replica are the same as those of HIOM with the vectorized engine; unlike separate HIOM runs,
+    all replicas live on the same network realization.
+
+    Attributes
+    ----------
+    replicas : int
+        Number of replicas R
+    opinions, attentions, informations : np.ndarray
+        (R, N) state arrays
+    graph : CSRGraph
+        Network shared by all replicas
+    rng : np.random.Generator
+        Source of all randomness of the ensemble
+
+    Methods
+    -------
+    step : None
+        Advances all replicas by one step
+    run_model : None
+        Runs the given number of steps
+    stats : list
+        Applies a function from src/stats.py to the opinions of every replica
+    """
+    def __init__(
+            self,
+            replicas,
+            agents=agents,
+            dt=0.1,
+            attention_delta=0.1,
+            persuasion=1,
+            a_min=-0.5,
+            r_min=0.05,
+            sd_opinion=0.15,
+            sd_info=0.005,
+            network_params=None,
+            seed=None,
+            graph=None
+    ):
+        self.replicas = replicas
+        self.dt = dt
+        self.attention_delta = attention_delta
+        self.persuasion = persuasion
+        self.a_min = a_min
+        self.r_min = r_min
+        self.sd_opinion = sd_opinion
+        self.sd_info = sd_info
+        self.rng = np.random.default_rng(seed)
+
+        if network_params is None:
+            network_params = {"method": "er", "p": 0.1}
+        self.population = sum(atype["n"] for atype in agents)
+        network_seed = int(self.rng.integers(2 ** 32))
+        network = Network(
+            n=self.population,
+            params=network_params,
+            seed=network_seed if seed is not None else None,
+            graph=graph
+        )
+        self.graph = network.get_csr()
+
+        n_nodes = self.graph.n
+        self.opinions = np.zeros((replicas, n_nodes))
+        self.attentions = np.zeros((replicas, n_nodes))
+        self.informations = np.zeros((replicas, n_nodes))
+        # every replica gets its own placement of the agent types and characters
+        type_ids = np.repeat(np.arange(len(agents)), [atype["n"] for atype in agents])
+        if len(type_ids) < n_nodes:
+            raise ValueError("The network has more nodes than there are agents")
+        for replica in range(replicas):
+            agent_types = self.rng.permutation(type_ids)[:n_nodes]
+            for type_idx, atype in enumerate(agents):
+                indices = np.flatnonzero(agent_types == type_idx)
+                characters = generate_characters(atype, len(indices), self.rng)
+                self.opinions[replica, indices] = characters["opinion"]
+                self.attentions[replica, indices] = characters["attention"]
+                self.informations[replica, indices] = characters["information"]
+
+        self.rows = np.arange(replicas)
+        self.steps = 0
+        self.time = 0.0
+
+    def step(self):
+        self.interact(*self.choose_pairs())
+        decay_attention(self.attentions, self.attention_delta, self.population)
+        update_opinions(
+            self.opinions,
+            self.attentions,
+            self.informations,
+            self.a_min,
+            self.dt,
+            self.sd_opinion,
+            self.rng
+        )
+        self.steps += 1
+        self.time += self.dt
+
+    def choose_pairs(self):
+        # attention-weighted active agent of every replica and a uniformly chosen neighbour,
+        # replicas whose active agent has no neighbours are left out
+        cumulative = np.cumsum(self.attentions, axis=1)
+        targets = self.rng.random(self.replicas) * cumulative[:, -1]
+        active = (cumulative <= targets[:, None]).sum(axis=1)
+        active = np.minimum(active, self.graph.n - 1)
+        neighbour = self.graph.random_neighbours(active, self.rng)
+        connected = neighbour >= 0
+        return self.rows[connected], active[connected], neighbour[connected]
+
+    def interact(self, rows, active, neighbour):
+        # same as HIOM.interact for one pair in each of the given replicas
+        a = self.attentions
+        a[rows, active] += self.attention_delta * (2 - a[rows, active])
+        a[rows, neighbour] += self.attention_delta * (2 - a[rows, neighbour])
+        expo = np.exp(-self.persuasion * (a[rows, neighbour] - a[rows, active]))
+        r = self.r_min + (1 - self.r_min) / (1 + expo)
+        self.informations[rows, neighbour] = r * self.informations[rows, neighbour] \
+            + (1 - r) * self.informations[rows, active] \
+            + self.rng.normal(0, self.sd_info, size=len(rows))
+
+    def run_model(self, step_count=500):
+        for i in range(step_count):
+            self.step()
+
+    def stats(self, stat_function):
+        """
+        Applies a statistic from src/stats.py to the current opinions of every replica.
+
+        Returns
+        -------
+        results : list
+            Result of stat_function for every replica
+        """
+        return [stat_function(opinions) for opinions in self.opinions]
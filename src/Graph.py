@@ -0,0 +1,111 @@
+import networkx as nx
+import numpy as np
+
+
+class CSRGraph:
+    """
+    A compact representation of the network in compressed sparse row (CSR) format.
+
+    Nodes of the network are numbered 0..n-1 in the order of the original graph, which is also
+    the order of the agents in the state arrays of the model. Neighbours of node i are stored in
+    indices[indptr[i]:indptr[i+1]].
+
+    Attributes
+    ----------
+    indptr : np.ndarray
+        Array of n+1 offsets into indices
+    indices : np.ndarray
+        Concatenated neighbour lists (as node numbers, not labels)
+    nodes : list or range
+        Original node labels, e.g. ints, tuples for lattice or strings for social media graphs
+    index : dict
+        Maps original node label to node number, built on first use
+
+    Methods
+    -------
+    from_networkx : CSRGraph
+        Builds the CSR arrays from a networkx graph
+    from_edges : CSRGraph
+        Builds the CSR arrays from arrays of edge end points
+    to_networkx : Graph
+        Builds a networkx graph with the same node order and labels
+    random_neighbour : int
+        Returns a uniformly chosen neighbour of a node, -1 if the node is isolated
+    random_neighbours : np.ndarray
+        Returns a uniformly chosen neighbour of every node of an array, -1 for isolated nodes
+    """
+    def __init__(self, indptr, indices, nodes=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.n = len(indptr) - 1
+        if nodes is None:
+            nodes = range(self.n)
+        self.nodes = nodes
+        self._index = None
+
+    @classmethod
+    def from_networkx(cls, G):
+        nodes = list(G.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        degrees = np.fromiter((len(G[node]) for node in nodes), dtype=np.int64, count=len(nodes))
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.fromiter(
+            (index[neighbour] for node in nodes for neighbour in G[node]),
+            dtype=index_dtype(len(nodes)),
+            count=indptr[-1]
+        )
+        graph = cls(indptr, indices, nodes)
+        graph._index = index
+        return graph
+
+    @classmethod
+    def from_edges(cls, n, sources, targets, nodes=None):
+        """
+        Builds the graph from arrays of node numbers of undirected edges, every edge is given once.
+        """
+        rows = np.concatenate((sources, targets))
+        cols = np.concatenate((targets, sources)).astype(index_dtype(n))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        indices = cols[np.argsort(rows, kind="stable")]
+        return cls(indptr, indices, nodes)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {node: i for i, node in enumerate(self.nodes)}
+        return self._index
+
+    def to_networkx(self):
+        G = nx.Graph()
+        G.add_nodes_from(self.nodes)
+        rows = np.repeat(np.arange(self.n), np.diff(self.indptr))
+        cols = np.asarray(self.indices)
+        # every edge is stored in both directions, one of them is enough
+        upper = rows <= cols
+        nodes = self.nodes
+        G.add_edges_from((nodes[u], nodes[v]) for u, v in zip(rows[upper].tolist(), cols[upper].tolist()))
+        return G
+
+    def random_neighbour(self, i, rng):
+        start = self.indptr[i]
+        degree = self.indptr[i + 1] - start
+        if degree == 0:
+            return -1
+        return self.indices[start + rng.integers(degree)]
+
+    def random_neighbours(self, nodes, rng):
+        indptr = np.asarray(self.indptr)
+        starts = indptr[nodes]
+        degrees = indptr[nodes + 1] - starts
+        offsets = (rng.random(len(nodes)) * degrees).astype(np.int64)
+        neighbours = np.full(len(nodes), -1, dtype=np.int64)
+        connected = degrees > 0
+        neighbours[connected] = np.asarray(self.indices)[starts[connected] + offsets[connected]]
+        return neighbours
+
+
+def index_dtype(n):
+    # 32 bit node numbers are enough for all but enormous graphs and halve the memory
+    return np.int32 if n < 2 ** 31 else np.int64
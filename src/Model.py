@@ -1,12 +1,23 @@
-import random
+import json
+import warnings
 import numpy as np
 from mesa import Model
 from mesa.space import NetworkGrid
 from mesa.datacollection import DataCollector
 from mesa.time import BaseScheduler
 
-from .Agent import Agent
+from .Agent import Agent, generate_characters
 from .Network import Network
+from .Graph import CSRGraph
+from .Sampler import samplers, SumTreeSampler
+from .Recorder import Recorder, DiskRecorder
+from .OnlineStats import OnlineStats
+from .Stopping import StoppingCriteria
+from .Profiler import Profiler
+from .Partition import Partition
+from .kernels import numba_available, run_steps
+from .dynamics import attention_decay_factor, decay_attention, update_opinions, \
+    attention_decay_rate, integrate_opinions, conflict_free_pairs
 import sys
 sys.path.append('../')
 
@@ -14,6 +25,10 @@ from scenarios.test import agents
 
 
 class HIOM(Model):
+    # rounds of new draws replacing the pairs of a batched step which share an agent, a step
+    # keeps fewer than K interactions only if too few agents have neighbours
+    max_redraws = 100
+
     def __init__(
             self,
             agents=agents,
@@ -24,11 +39,28 @@ class HIOM(Model):
             r_min=0.05,
             sd_opinion=0.15,
             sd_info=0.005,
-            network_params=None
+            network_params=None,
+            engine="agent",
+            selection="linear",
+            recorder_params=None,
+            seed=None,
+            online_stats=None,
+            headless=False,
+            profile=None,
+            checkpoint=None,
+            graph=None,
+            partition_params=None,
+            interactions_per_step=1,
+            opinion_step=None
     ):
 
         super().__init__()
 
+        # every stochastic part of the model (network, agent generators,
+        # agent choice and noise) draws from this generator
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
         self.dt = dt
         self.attention_delta = attention_delta
         self.persuasion = persuasion
@@ -37,121 +69,770 @@ class HIOM(Model):
         self.sd_opinion = sd_opinion
         self.sd_info = sd_info
 
-        # initialize a scheduler
-        self.schedule = BaseScheduler(self)
+        # "agent" steps every mesa agent one by one (reference implementation),
+        # "vectorized" updates the whole population with array operations,
+        # "numba" runs many steps at once in a compiled kernel (src/kernels.py),
+        # "partitioned" runs them in shard worker processes (src/Partition.py)
+        self.step_methods = {"agent": self.agent_step,
+                             "vectorized": self.vectorized_step,
+                             "numba": self.vectorized_step,
+                             "partitioned": self.vectorized_step}
+        if engine not in self.step_methods:
+            raise ValueError("Unknown engine: " + str(engine))
+        if engine == "numba" and not numba_available:
+            warnings.warn("numba is not installed, the vectorized engine is used instead")
+            engine = "vectorized"
+        self.engine = engine
+        # with K > 1 interactions per step the vectorized engine draws K pairs of agents which
+        # do not share an agent and applies their interactions at once (see batched_step)
+        if interactions_per_step < 1:
+            raise ValueError("A step needs at least one interaction")
+        if interactions_per_step > 1:
+            if engine != "vectorized":
+                raise ValueError("Several interactions per step need the vectorized engine")
+            self.step_methods["vectorized"] = self.batched_step
+        self.interactions_per_step = interactions_per_step
+        # longest substep of the opinion update of such steps, by default the whole step of K * dt
+        # is one update, a cap of about dt keeps the explicit update as stable as with one
+        # interaction per step
+        if opinion_step is not None and opinion_step <= 0:
+            raise ValueError("The opinion step has to be positive")
+        if opinion_step is None and interactions_per_step * dt > 0.5:
+            warnings.warn("One opinion update of K * dt > 0.5 per step can diverge, pass an opinion_step of about dt")
+        self.opinion_step = opinion_step
+        # strategy used to choose the active agent: "linear" scans all
+        # attentions, "sumtree" keeps a Fenwick tree updated in O(log N)
+        if selection not in samplers:
+            raise ValueError("Unknown selection strategy: " + str(selection))
+        if engine == "partitioned":
+            # the interactions of a batch are simulated before the state arrays
+            # are updated, which needs the attentions kept by the sum-tree
+            selection = "sumtree"
+        self.selection = selection
+        # opt-in timing of the phases of a step, True or e.g. {"memory_every": 100},
+        # the methods of the phases are replaced by timed wrappers (see src/Profiler.py)
+        self.profiler = None
+        if profile:
+            self.init_profiler(profile)
+
+        # headless models do not build the mesa layer (networkx graph, scheduler, grid
+        # and agent instances) until something asks for schedule, grid, G or agent_list
+        self.headless = headless
+        self._schedule = None
+        self._grid = None
+        self._G = None
+        self._agent_list = None
+        self.steps = 0
+        # simulated time, every step advances it by dt (times the interactions per step)
+        self.time = 0.0
+        # set by run_model
+        self.stop_reason = None
+        self.stop_step = None
 
         # create the population
         self.population = 0
         if network_params is None:
             network_params = {"method": "er", "p": 0.1}
-        self.init_population(agents, network_params)
-        # self.G = nx.Graph()
+        self.network_params = network_params
+        if checkpoint is None:
+            # a graph generated before from network_params (e.g. shared by a sweep) is used as is
+            self.init_population(agents, network_params, graph)
 
-        # generates network topology
-        # not used right now, but can be used for mesa visualization
-        self.grid = NetworkGrid(self.G)
-
-        # create agents
-        self.create_agents(agents)
+            # create agents
+            self.create_agents(agents)
+        else:
+            # state of a saved or forked model, see checkpoint()
+            self.restore(checkpoint)
+        # the partitioned engine moves the state arrays into shared memory and starts
+        # its workers, e.g. {"shards": 8, "batch": 1000}, see src/Partition.py
+        self.partition_params = partition_params
+        self.partition = None
+        if engine == "partitioned":
+            self.partition = Partition(self, **(partition_params or {}))
+        if not headless:
+            self.init_mesa()
 
         # agent who will interact this turn
         self.active_agent = None
+        self.active_index = None
+        # all active agents drawn in a step with several interactions
+        self.active_indices = None
+        # indices of the agents which interacted in the last step
+        self.last_interaction = None
+        self.sampler = samplers[selection](self.attentions, self.rng)
 
         # add datacollector
-        # collects opinion, information and attention each step
-        self.data_collector = DataCollector({
-            "Opinion": lambda m: self.collect_opinions(),
-            "Attention": lambda m: self.collect_attentions(),
-            "Information": lambda m: self.collect_informations()
-        })
+        # collects opinion, information and attention each step,
+        # headless models use the columnar recorder by default
+        if recorder_params is None:
+            recorder_params = {"method": "array" if headless else "datacollector"}
+        self.data_collector = self.init_recorder(recorder_params)
+        # optional statistics of the opinions computed while running,
+        # e.g. {"every": 10, "bins": 20, "range": (-2, 2)}, see src/OnlineStats.py
+        self.online_stats = None
+        if online_stats is not None:
+            self.online_stats = OnlineStats(**online_stats)
 
         # this is required for the data_collector to work
         self.running = True
-        self.data_collector.collect(self)
+        self.collect()
 
-    def init_population(self, agents, network_params):
+    def init_recorder(self, recorder_params):
+        # "datacollector" is the mesa DataCollector storing lists of [id, value] pairs,
+        # "array" is the columnar Recorder, e.g. {"method": "array", "every": 10, "dtype": "float32"},
+        # "disk" streams snapshots to a file, e.g. {"method": "disk", "path": "run.traj", "every": 10}
+        params = dict(recorder_params)
+        method = params.pop("method")
+        if method == "datacollector":
+            return DataCollector({
+                "Opinion": lambda m: self.collect_opinions(),
+                "Attention": lambda m: self.collect_attentions(),
+                "Information": lambda m: self.collect_informations()
+            })
+        if method == "array":
+            return Recorder(self, **params)
+        if method == "disk":
+            return DiskRecorder(self, **params)
+        raise ValueError("Unknown recorder: " + str(method))
+
+    def init_population(self, agents, network_params, graph=None):
         # population size is calculated and an array of
         # possible agent types is stored for pop generation
         pop_size = 0
         for atype in agents:
             pop_size += atype["n"]
         self.population = pop_size
-        # network topology is initialized
-        network = Network(n=self.population, params=network_params)
-        self.G = network.get_graph()
+        # network topology is initialized, unseeded models do not pass
+        # the seed on so that their graphs are never written to the graph cache
+        network_seed = int(self.rng.integers(2 ** 32))
+        self.network = Network(
+            n=self.population,
+            params=network_params,
+            seed=network_seed if self.seed is not None else None,
+            graph=graph
+        )
+        # neighbour lists are stored once as CSR arrays, graph node i
+        # belongs to the agent with index i in the state arrays
+        self.graph = self.network.get_csr()
+        # state of the agents is kept in contiguous arrays,
+        # agents only read and write their own entries
+        n_nodes = self.graph.n
+        self.opinions = np.zeros(n_nodes)
+        self.attentions = np.zeros(n_nodes)
+        self.informations = np.zeros(n_nodes)
 
     def create_agents(self, agents):
-        types = []
-        for atype in agents:
-            types.append([atype["n"], atype["generator"]])
-        # for each node in the network, agent type
-        # is chosen by random choice and an agent is created
-        for node in self.G.nodes:
+        # agent types are assigned to the nodes by a single
+        # shuffled permutation of all the agents to be created
+        n_nodes = self.graph.n
+        type_ids = np.repeat(np.arange(len(agents)), [atype["n"] for atype in agents])
+        if len(type_ids) < n_nodes:
+            raise ValueError("The network has more nodes than there are agents")
+        self.agent_types = self.rng.permutation(type_ids)[:n_nodes]
+        for type_idx, atype in enumerate(agents):
+            self.init_characters(atype, np.flatnonzero(self.agent_types == type_idx))
+
+    def init_profiler(self, profile):
+        params = {} if profile is True else dict(profile)
+        profiler = self.profiler = Profiler(**params)
+        self.choose_agent = profiler.wrap("choose", self.choose_agent)
+        self.update_sampler = profiler.wrap("choose", self.update_sampler)
+        self.interact = profiler.wrap("interact", self.interact)
+        # array form of the interaction used by the batched, partitioned and event-driven steps
+        self.interaction = profiler.wrap("interact", self.interaction)
+        self.compiled_steps = profiler.wrap("update", self.compiled_steps)
+        self.partitioned_steps = profiler.wrap("update", self.partitioned_steps)
+        self.collect = profiler.wrap("collect", self.collect, sample=True)
+        self.step_methods = {engine: profiler.wrap("update", method) for engine, method in self.step_methods.items()}
+
+    def init_mesa(self):
+        # builds the networkx graph, scheduler and grid and creates
+        # an agent for each node in the network, agent i gets unique_id i + 1
+        self._G = self.network.get_graph() if self.network is not None else self.graph.to_networkx()
+        self._schedule = BaseScheduler(self)
+        self._schedule.steps = self.steps
+        self._schedule.time = self.steps
+        # generates network topology
+        # not used right now, but can be used for mesa visualization
+        self._grid = NetworkGrid(self._G)
+        self._agent_list = []
+        self.current_id = 0
+        for index, node in enumerate(self.graph.nodes):
             # finds all neighbours in the network
-            neighbours = [edge[1] for edge in self.G.edges(node)]
-            # chooses the agent type by random choice
-            type_idx = random.choice(range(len(types)))
-            agent_type = types[type_idx]
-            # creates new agent using the generator func (agent_type[1])
-            self.new_agent(node, neighbours, agent_type[1])
-            # number of agents needed to create is reduced
-            # and the type is removed if no more agents of this
-            # type can be created
-            agent_type[0] -= 1
-            if agent_type[0] == 0:
-                del types[type_idx]
-
-    def new_agent(self, graph_id, neighbours, generator):
+            neighbours = [edge[1] for edge in self._G.edges(node)]
+            self.new_agent(node, neighbours, None, index)
+        if self.profiler is not None:
+            # the interaction is a part of the step of the active agent
+            for agent in self._agent_list:
+                agent.interact = self.profiler.wrap("interact", agent.interact)
+
+    @property
+    def schedule(self):
+        if self._schedule is None:
+            self.init_mesa()
+        return self._schedule
+
+    @schedule.setter
+    def schedule(self, schedule):
+        # mesa.Model.__init__ sets the scheduler to None
+        self._schedule = schedule
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            self.init_mesa()
+        return self._grid
+
+    @property
+    def G(self):
+        if self._G is None:
+            self.init_mesa()
+        return self._G
+
+    @property
+    def agent_list(self):
+        if self._agent_list is None:
+            self.init_mesa()
+        return self._agent_list
+
+    def init_characters(self, atype, indices):
+        characters = generate_characters(atype, len(indices), self.rng)
+        self.opinions[indices] = characters["opinion"]
+        self.attentions[indices] = characters["attention"]
+        self.informations[indices] = characters["information"]
+
+    def new_agent(self, graph_id, neighbours, generator, index):
         agent_id = self.next_id()
         agent = Agent(
             self,
             agent_id,
             graph_id,
             neighbours,
-            generator
+            generator,
+            index
         )
-        self.schedule.add(agent)
-        self.grid.place_agent(agent, graph_id)
+        self._agent_list.append(agent)
+        self._schedule.add(agent)
+        self._grid.place_agent(agent, graph_id)
 
     def step(self):
         self.choose_agent()
-        self.schedule.step()
+        self.last_interaction = None
+        self.step_methods[self.engine]()
+        self.update_sampler()
+        self.steps += 1
+        self.time += self.dt * self.interactions_per_step
         # Save the statistics
+        self.collect()
+
+    def collect(self):
         self.data_collector.collect(self)
+        if self.online_stats is not None:
+            self.online_stats.collect(self)
+
+    def agent_step(self):
+        self.schedule.step()
+
+    def vectorized_step(self):
+        # the single interaction is a scalar side path on the state arrays,
+        # decay and opinion update are applied to the whole population at once
+        neighbour = self.graph.random_neighbour(self.active_index, self.rng)
+        if neighbour >= 0:
+            self.interact(self.active_index, neighbour)
+        decay_attention(self.attentions, self.attention_delta, self.population)
+        update_opinions(
+            self.opinions,
+            self.attentions,
+            self.informations,
+            self.a_min,
+            self.dt,
+            self.sd_opinion,
+            self.rng
+        )
+        if self._schedule is not None:
+            self._schedule.steps += 1
+            self._schedule.time += 1
+
+    def batched_step(self):
+        # K interactions at once: pairs sharing an agent with an earlier pair of the step are
+        # replaced by new draws until K pairs without a shared agent are left, which are applied
+        # together, and the population is advanced by K * dt in one update (or in substeps of
+        # at most opinion_step). Every agent interacts at most once per step and all pairs are
+        # drawn from the attentions at the start of the step, so agents with high attention
+        # interact a little less often than in K steps with one interaction when K is not
+        # small compared with N.
+        k = self.interactions_per_step
+        active, neighbour = conflict_free_pairs(
+            self.active_indices, self.graph.random_neighbours(self.active_indices, self.rng)
+        )
+        for _ in range(self.max_redraws):
+            if len(active) == k:
+                break
+            extra = self.sampler.sample_many(k - len(active))
+            active, neighbour = conflict_free_pairs(
+                np.concatenate((active, extra)),
+                np.concatenate((neighbour, self.graph.random_neighbours(extra, self.rng)))
+            )
+        a = self.attentions
+        a[active], a[neighbour], self.informations[neighbour] = self.interaction(
+            a[active], a[neighbour], self.informations[active], self.informations[neighbour], len(active)
+        )
+        self.last_interaction = np.concatenate((active, neighbour))
+        substeps = 1
+        if self.opinion_step is not None:
+            substeps = int(np.ceil(k * self.dt / self.opinion_step - 1e-9))
+        h = k * self.dt / substeps
+        for _ in range(substeps):
+            decay_attention(self.attentions, self.attention_delta, self.population, steps=h / self.dt)
+            integrate_opinions(
+                self.opinions,
+                self.attentions,
+                self.informations,
+                self.a_min,
+                self.dt,
+                self.sd_opinion,
+                self.rng,
+                h
+            )
+        if self._schedule is not None:
+            self._schedule.steps += 1
+            self._schedule.time += 1
+
+    def interact(self, active, neighbour):
+        # same as Agent.interact, but working with indices into the state arrays
+        self.last_interaction = (active, neighbour)
+        a = self.attentions
+        a[active] += self.attention_delta * (2 - a[active])
+        a[neighbour] += self.attention_delta * (2 - a[neighbour])
+        expo = np.exp(-self.persuasion * (a[neighbour] - a[active]))
+        r = self.r_min + (1 - self.r_min) / (1 + expo)
+        self.informations[neighbour] = r * self.informations[neighbour] \
+            + (1 - r) * self.informations[active] \
+            + self.rng.normal(0, self.sd_info)
+
+    def update_sampler(self):
+        # all attentions decayed by the same factor, only the
+        # interacting agents have to be updated individually
+        self.sampler.decay(attention_decay_factor(self.attention_delta, self.population) ** self.interactions_per_step)
+        if self.last_interaction is not None:
+            for index in self.last_interaction:
+                self.sampler.update(index, self.attentions[index])
 
     def choose_agent(self):
         # weighted random choice based on agents attentions
-        ids = []
-        attentions = []
-        attention_sum = 0
-        for agent in self.schedule.agents:
-            ids.append(agent.unique_id)
-            attentions.append(agent.attention)
-            attention_sum += agent.attention
-        attentions = np.array(attentions) / attention_sum
-        self.active_agent = random.choices(ids, attentions, k=1)[0]
+        if self.interactions_per_step > 1:
+            self.active_indices = self.sampler.sample_many(self.interactions_per_step)
+            self.active_index = int(self.active_indices[0])
+        else:
+            self.active_index = self.sampler.sample()
+        self.active_agent = self.active_index + 1
 
     def collect_opinions(self):
-        opinions = []
-        for agent in self.schedule.agents:
-            opinions.append([agent.unique_id, agent.opinion])
-        return opinions
+        return [[index + 1, value] for index, value in enumerate(self.opinions.tolist())]
 
     def collect_attentions(self):
-        attentions = []
-        for agent in self.schedule.agents:
-            attentions.append([agent.unique_id, agent.attention])
-        return attentions
+        return [[index + 1, value] for index, value in enumerate(self.attentions.tolist())]
 
     def collect_informations(self):
-        informations = []
-        for agent in self.schedule.agents:
-            informations.append([agent.unique_id, agent.information])
-        return informations
+        return [[index + 1, value] for index, value in enumerate(self.informations.tolist())]
 
-    def run_model(self, step_count=500):
+    def run_model(self, step_count=500, stopping=None):
         '''
         Runs model.
+
+        With stopping, e.g. {"every": 50, "mean_change": 1e-3, "patience": 2}, the run ends early
+        once the population has converged (see src/Stopping.py). Why and after how many steps
+        the model stopped is stored in stop_reason ("step_count" if the budget was used up)
+        and stop_step.
         '''
-        for i in range(step_count):
-            self.step()
+        criteria = None if stopping is None else StoppingCriteria(**stopping)
+        if isinstance(self.data_collector, (Recorder, DiskRecorder)):
+            self.data_collector.reserve(step_count)
+        self.stop_reason = "step_count"
+        try:
+            if self.engine in ("numba", "partitioned"):
+                self.run_compiled(step_count, criteria)
+            else:
+                for i in range(step_count):
+                    self.step()
+                    if self.check_stopping(criteria):
+                        break
+        except BaseException:
+            # a failed or interrupted run keeps the trajectory file up to the last snapshot
+            if isinstance(self.data_collector, DiskRecorder):
+                self.data_collector.close()
+            raise
+        self.stop_step = self.steps
+        if isinstance(self.data_collector, DiskRecorder):
+            self.data_collector.flush()
+
+    def check_stopping(self, criteria):
+        if criteria is None:
+            return False
+        reason = criteria.check(self)
+        if reason is None:
+            return False
+        self.stop_reason = reason
+        self.running = False
+        return True
+
+    def run_compiled(self, step_count, criteria):
+        # the compiled kernel (or the partition) runs all steps up to the next snapshot
+        # (of the recorder, online statistics or stopping criteria) in one call, the
+        # collectors are told about the skipped steps and called once at the snapshot.
+        # Chunks end where the counters of the observers are due, also when run_model
+        # is called several times, the mesa DataCollector is due every step
+        batch_steps = self.compiled_steps if self.engine == "numba" else self.partitioned_steps
+        observers = [self.data_collector, self.online_stats, criteria]
+        observers = [observer for observer in observers if observer is not None]
+        done = 0
+        while done < step_count:
+            chunk = min([step_count - done] + [
+                observer.steps_to_snapshot() if hasattr(observer, "steps_to_snapshot") else 1
+                for observer in observers
+            ])
+            batch_steps(chunk)
+            done += chunk
+            if chunk > 1:
+                for observer in observers:
+                    observer.advance(chunk - 1)
+            self.collect()
+            if self.check_stopping(criteria):
+                break
+
+    def compiled_steps(self, step_count):
+        active, neighbour = run_steps(
+            self.opinions,
+            self.attentions,
+            self.informations,
+            np.asarray(self.graph.indptr),
+            np.asarray(self.graph.indices),
+            step_count,
+            self.dt,
+            self.attention_delta,
+            self.persuasion,
+            self.a_min,
+            self.r_min,
+            self.sd_opinion,
+            self.sd_info,
+            self.population,
+            int(self.rng.integers(2 ** 32))
+        )
+        self.active_index = active
+        self.active_agent = active + 1
+        self.last_interaction = (active, neighbour) if neighbour >= 0 else None
+        self.sampler.rebuild(self.attentions)
+        self.steps += step_count
+        self.time += step_count * self.dt
+        if self._schedule is not None:
+            self._schedule.steps += step_count
+            self._schedule.time += step_count
+
+    def partitioned_steps(self, step_count):
+        # the interactions of a batch are simulated first, the sampler tracks the decay
+        # of all attentions through its scale, then the shard workers run the batch
+        factor = attention_decay_factor(self.attention_delta, self.population)
+        sampler = self.sampler
+        done = 0
+        while done < step_count:
+            batch = min(self.partition.batch, step_count - done)
+            events = []
+            informations = {}
+            for step in range(batch):
+                active = sampler.sample()
+                neighbour = self.graph.random_neighbour(active, self.rng)
+                self.last_interaction = None
+                if neighbour >= 0:
+                    a_active, a_neighbour, information = self.interaction(
+                        sampler.weights[active] * sampler.scale,
+                        sampler.weights[neighbour] * sampler.scale,
+                        informations.get(active, self.informations[active]),
+                        informations.get(neighbour, self.informations[neighbour])
+                    )
+                    informations[neighbour] = information
+                    sampler.update(active, a_active)
+                    sampler.update(neighbour, a_neighbour)
+                    events.append((step, active, a_active, neighbour, a_neighbour, information))
+                    self.last_interaction = (active, neighbour)
+                sampler.decay(factor)
+            self.partition.run(batch, events, int(self.rng.integers(2 ** 63)))
+            done += batch
+        self.active_index = active
+        self.active_agent = active + 1
+        self.steps += step_count
+        self.time += step_count * self.dt
+        if self._schedule is not None:
+            self._schedule.steps += step_count
+            self._schedule.time += step_count
+
+    def interaction(self, a_active, a_neighbour, i_active, i_neighbour, size=None):
+        # new attentions of both agents and information of the neighbour, see interact,
+        # with size the arguments are arrays of that many interactions
+        a_active += self.attention_delta * (2 - a_active)
+        a_neighbour += self.attention_delta * (2 - a_neighbour)
+        expo = np.exp(-self.persuasion * (a_neighbour - a_active))
+        r = self.r_min + (1 - self.r_min) / (1 + expo)
+        information = r * i_neighbour + (1 - r) * i_active + self.rng.normal(0, self.sd_info, size)
+        return a_active, a_neighbour, information
+
+    def close(self):
+        '''
+        Stops the shard workers of the partitioned engine and releases its shared memory, and
+        closes the trajectory file of the disk recorder.
+        '''
+        if self.partition is not None:
+            self.partition.close()
+        if isinstance(self.data_collector, DiskRecorder):
+            self.data_collector.close()
+
+    def run_until(self, t_end, snapshot_times=None, rate=None, opinion_step=None):
+        '''
+        Runs model in continuous time until t_end, an alternative to run_model.
+
+        Interactions are events of a Poisson process. By default (rate=None) they happen at a total
+        rate of 1/dt with the active agent chosen proportionally to attention, which is the
+        continuous-time counterpart of run_model. With a number passed as rate, agent i starts
+        interactions at rate * attention_i, so quiet periods of low attention contain few events.
+
+        Opinions do not influence attention or information, so the events up to the next snapshot
+        are simulated first, touching only the interacting agents (attention decays in closed form
+        through the global scale of the sum-tree sampler). Opinions of the whole population are
+        then integrated over the period with Euler-Maruyama substeps of length opinion_step
+        (default dt, larger values trade accuracy for speed; the explicit scheme becomes unstable
+        for substeps above roughly 0.3), applying the logged interactions at the end of the
+        substep they fall into.
+
+        Returns a dictionary with the snapshot times ("Time") and (k, N) arrays of "Opinion",
+        "Attention" and "Information" at the requested snapshot_times (plus t_end).
+
+        Every dt of simulated time (counted from the start of the call) is a step as in run_model:
+        the step counter advances and the recorder and online statistics are called at their
+        snapshot steps, with the state at that time.
+        '''
+        h = self.dt if opinion_step is None else opinion_step
+        decay_rate = attention_decay_rate(self.attention_delta, self.population, self.dt)
+        # the events need the current attention of any agent in O(1), which the scale and
+        # weights of the sum-tree sampler provide; a linear sampler reads the state arrays
+        # and stays valid, so it is kept for later steps
+        sampler = self.sampler
+        if not isinstance(sampler, SumTreeSampler):
+            sampler = SumTreeSampler(self.attentions, self.rng)
+        if isinstance(self.data_collector, (Recorder, DiskRecorder)):
+            self.data_collector.reserve(int((t_end - self.time) / self.dt) + 1)
+        observers = [observer for observer in (self.data_collector, self.online_stats) if observer is not None]
+
+        if snapshot_times is None:
+            snapshot_times = []
+        times = sorted(t for t in snapshot_times if self.time < t < t_end) + [t_end]
+        snapshots = {"Time": [], "Opinion": [], "Attention": [], "Information": []}
+        start_time = self.time
+        start_steps = self.steps
+        for snapshot_time in times:
+            while self.time < snapshot_time:
+                # the period is split at the next step at which an observer is due
+                due = min(observer.steps_to_snapshot() if hasattr(observer, "steps_to_snapshot") else 1
+                          for observer in observers)
+                collect_time = start_time + (self.steps - start_steps + due) * self.dt
+                collecting = collect_time <= snapshot_time + 1e-9 * self.dt
+                target = collect_time if collecting else snapshot_time
+                events = self.simulate_events(target, rate, decay_rate, sampler)
+                self.integrate_events(target, events, h, decay_rate)
+                if collecting:
+                    if due > 1:
+                        for observer in observers:
+                            observer.advance(due - 1)
+                    self.count_steps(due)
+                    self.collect()
+            snapshots["Time"].append(self.time)
+            snapshots["Opinion"].append(self.opinions.copy())
+            snapshots["Attention"].append(self.attentions.copy())
+            snapshots["Information"].append(self.informations.copy())
+        # steps completed after the last collection, at which no observer was due
+        elapsed = int((self.time - start_time) / self.dt + 1e-9) - (self.steps - start_steps)
+        if elapsed > 0:
+            for observer in observers:
+                observer.advance(elapsed)
+            self.count_steps(elapsed)
+        if isinstance(self.data_collector, DiskRecorder):
+            self.data_collector.flush()
+        return {name: np.array(values) for name, values in snapshots.items()}
+
+    def count_steps(self, step_count):
+        # steps of simulated time passed in run_until
+        self.steps += step_count
+        if self._schedule is not None:
+            self._schedule.steps += step_count
+            self._schedule.time += step_count
+
+    def simulate_events(self, t_end, rate, decay_rate, sampler):
+        # interaction events between self.time and t_end, state arrays are not modified
+        informations = {}
+        events = []
+        event_time = self.time
+        while True:
+            if rate is None:
+                gap = self.rng.exponential(self.dt)
+            else:
+                # Poisson process with exponentially decaying total rate,
+                # the integrated rate is inverted to get the next event
+                x = decay_rate * self.rng.exponential() / (rate * sampler.total * sampler.scale)
+                gap = np.inf if x >= 1 else -np.log1p(-x) / decay_rate
+            if event_time + gap > t_end:
+                sampler.decay(np.exp(-decay_rate * (t_end - event_time)))
+                return events
+            event_time += gap
+            sampler.decay(np.exp(-decay_rate * gap))
+            active = sampler.sample()
+            neighbour = self.graph.random_neighbour(active, self.rng)
+            if neighbour < 0:
+                continue
+            a_active, a_neighbour, information = self.interaction(
+                sampler.weights[active] * sampler.scale,
+                sampler.weights[neighbour] * sampler.scale,
+                informations.get(active, self.informations[active]),
+                informations.get(neighbour, self.informations[neighbour])
+            )
+            informations[neighbour] = information
+            sampler.update(active, a_active)
+            sampler.update(neighbour, a_neighbour)
+            events.append((event_time, active, a_active, neighbour, a_neighbour, information))
+
+    def integrate_events(self, t_end, events, h, decay_rate):
+        # integrates opinions until t_end, applying the logged events on the way
+        next_event = 0
+        while self.time < t_end - 1e-12 * h:
+            substep = min(h, t_end - self.time)
+            self.time += substep
+            self.attentions *= np.exp(-decay_rate * substep)
+            while next_event < len(events) and events[next_event][0] <= self.time:
+                event_time, active, a_active, neighbour, a_neighbour, information = events[next_event]
+                decay = np.exp(-decay_rate * (self.time - event_time))
+                self.attentions[active] = a_active * decay
+                self.attentions[neighbour] = a_neighbour * decay
+                self.informations[neighbour] = information
+                next_event += 1
+            integrate_opinions(
+                self.opinions,
+                self.attentions,
+                self.informations,
+                self.a_min,
+                self.dt,
+                self.sd_opinion,
+                self.rng,
+                substep
+            )
+        self.time = t_end
+
+
+    def checkpoint(self):
+        '''
+        Returns the state needed to continue the model: parameters, population, state arrays,
+        state of the random generator, step counter and time, and the network.
+        '''
+        return {
+            "params": {
+                "dt": self.dt,
+                "attention_delta": self.attention_delta,
+                "persuasion": self.persuasion,
+                "a_min": self.a_min,
+                "r_min": self.r_min,
+                "sd_opinion": self.sd_opinion,
+                "sd_info": self.sd_info,
+                "network_params": self.network_params,
+                "engine": self.engine,
+                "selection": self.selection,
+                "seed": self.seed,
+                "headless": self.headless,
+                "partition_params": self.partition_params,
+                "interactions_per_step": self.interactions_per_step,
+                "opinion_step": self.opinion_step
+            },
+            "population": self.population,
+            "steps": self.steps,
+            "time": self.time,
+            "rng_state": self.rng.bit_generator.state,
+            "opinions": self.opinions.copy(),
+            "attentions": self.attentions.copy(),
+            "informations": self.informations.copy(),
+            "agent_types": self.agent_types.copy(),
+            "network_seed": None if self.network is None else self.network.seed,
+            "network": self.network,
+            "graph": self.graph
+        }
+
+    def restore(self, checkpoint):
+        self.population = checkpoint["population"]
+        self.network = checkpoint.get("network")
+        self.graph = checkpoint.get("graph")
+        if self.graph is None:
+            # the network is a reference which is regenerated from its parameters and seed
+            self.network = Network(
+                n=self.population,
+                params=self.network_params,
+                seed=checkpoint["network_seed"]
+            )
+            self.graph = self.network.get_csr()
+        self.opinions = np.array(checkpoint["opinions"], dtype=np.float64)
+        self.attentions = np.array(checkpoint["attentions"], dtype=np.float64)
+        self.informations = np.array(checkpoint["informations"], dtype=np.float64)
+        self.agent_types = np.array(checkpoint["agent_types"])
+        if checkpoint["rng_state"] is not None:
+            self.rng.bit_generator.state = checkpoint["rng_state"]
+        self.steps = checkpoint["steps"]
+        self.time = checkpoint["time"]
+
+    def save(self, path):
+        '''
+        Saves a checkpoint of the model to a .npz file, see load.
+
+        The network is stored as a reference (parameters and seed) if it can be generated again,
+        otherwise its CSR arrays are included.
+        '''
+        checkpoint = self.checkpoint()
+        arrays = {name: checkpoint[name] for name in ("opinions", "attentions", "informations", "agent_types")}
+        method = self.network_params["method"]
+        if self.network is None or (method in Network.seeded_methods and self.network.seed is None):
+            arrays["indptr"] = np.asarray(self.graph.indptr)
+            arrays["indices"] = np.asarray(self.graph.indices)
+        meta = {name: checkpoint[name] for name in ("params", "population", "steps", "time",
+                                                    "rng_state", "network_seed")}
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path, **overrides):
+        '''
+        Creates a model from a checkpoint saved by save. Parameters can be overridden, e.g.
+        HIOM.load("burn_in.npz", persuasion=10). Recording starts anew with the loaded state.
+        '''
+        with np.load(path) as data:
+            checkpoint = json.loads(str(data["meta"]))
+            for name in ("opinions", "attentions", "informations", "agent_types"):
+                checkpoint[name] = data[name]
+            if "indptr" in data:
+                checkpoint["graph"] = CSRGraph(data["indptr"], data["indices"])
+        return cls.from_checkpoint(checkpoint, **overrides)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint, **overrides):
+        params = dict(checkpoint["params"])
+        if "seed" in overrides:
+            # a new seed gives the continuation its own random stream
+            checkpoint = dict(checkpoint, rng_state=None)
+        params.update(overrides)
+        return cls(checkpoint=checkpoint, **params)
+
+    def fork(self, **overrides):
+        '''
+        Returns a copy of the model continuing from its current state, e.g. a warmed-up
+        model under a different persuasion: model.fork(persuasion=10). The copy shares the network
+        and continues the random stream of the model unless a seed is given.
+        '''
+        return self.from_checkpoint(self.checkpoint(), **overrides)
+
+
+def spawn_seeds(seed, n):
+    """
+    Derives seeds of n independent random streams from a single root seed,
+    e.g. for the runs of a parameter sweep.
+    """
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(n)]
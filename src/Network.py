@@ -1,6 +1,10 @@
 import networkx as nx
 import numpy as np
 
+from .Graph import CSRGraph
+from . import generators
+from .graph_cache import cache_key, file_hash, load_graph, store_graph
+
 
 class Network:
     """
@@ -24,17 +28,42 @@ class Network:
                 Path to the file containing graph's list of edges used to create social media graph.
             n_blocks : int
                 Number of components to be created in the stochastic block method
+            cache : bool or string
+                Store the graph in the graph cache (src/graph_cache.py), or in the given directory,
+                and load it from there in later runs. Social media graphs are keyed by the content
+                of the edge list, generated graphs ("er", "ba", "ws", "sb") only if they are seeded.
+                The least recently used graphs are removed above graph_cache.max_entries graphs,
+                graph_cache.clear_cache removes all of them.
+            seed : int
+                Seed of the graph generator, overrides the seed argument, e.g. to keep the same
+                network in all runs of a sweep
+            backend : string
+                "networkx" (default) or "numpy". The numpy backend generates "er", "ba", "ws", "sb"
+                and "lattice" networks directly as CSR arrays (src/generators.py) with integer node
+                labels, the networkx graph is then only built if get_graph is called.
     n : int
         Desired number of nodes in the network
+    seed : int
+        Seed of the random graph generators, None gives a different graph every time
+    graph : CSRGraph
+        Graph generated before from the same parameters, e.g. shared by a sweep (src/sweep.py),
+        which is used instead of generating it again
 
     Methods
     -------
     get_graph : Graph
         Returns a graph created according to the parameters
+    get_csr : CSRGraph
+        Returns the graph in CSR format
     """
-    def __init__(self, params, n=100):
-        self.G = nx.Graph()
+    # generators whose graphs are fully determined by the parameters, n and the seed
+    seeded_methods = ("er", "ba", "ws", "sb")
+
+    def __init__(self, params, n=100, seed=None, graph=None):
+        self.G = None
+        self.csr = None
         self.n = n
+        self.seed = params.get("seed", seed)
         self.params = params
         self.init_methods = {"er": self.create_random_graph,
                              "ba": self.create_ba_graph,
@@ -42,11 +71,81 @@ class Network:
                              "sb": self.create_sb_graph,
                              "lattice": self.create_lattice,
                              "social_media": self.create_social_media_graph}
-        self.init_methods[params['method']]()
+        self.native_methods = {"er": self.create_random_csr,
+                               "ba": self.create_ba_csr,
+                               "ws": self.create_ws_csr,
+                               "sb": self.create_sb_csr,
+                               "lattice": self.create_lattice_csr}
+        self.backend = params.get("backend", "networkx")
+        if self.backend not in ("networkx", "numpy"):
+            raise ValueError("Unknown network backend: " + str(self.backend))
+        if graph is not None:
+            self.csr = graph
+            return
+        key = self.cache_key()
+        if key is None:
+            self.generate()
+            return
+        cache_dir = params["cache"] if isinstance(params["cache"], str) else None
+        self.csr = load_graph(key, cache_dir)
+        if self.csr is None:
+            self.generate()
+            store_graph(key, self.get_csr(), cache_dir)
+
+    def generate(self):
+        method = self.params['method']
+        if self.backend == "numpy" and method in self.native_methods:
+            self.native_methods[method](np.random.default_rng(self.seed))
+        else:
+            self.init_methods[method]()
+
+    def cache_key(self):
+        """
+        Key of the graph in the graph cache, None if the graph is not to be cached.
+        """
+        method = self.params['method']
+        if not self.params.get("cache"):
+            return None
+        description = {name: value for name, value in self.params.items()
+                       if name not in ("cache", "path", "seed", "backend")}
+        if self.backend != "networkx":
+            description["backend"] = self.backend
+        if method == "social_media":
+            description["file"] = file_hash(self.params['path'])
+        elif method in self.seeded_methods and self.seed is not None:
+            description["n"] = self.n
+            description["seed"] = self.seed
+        else:
+            return None
+        return cache_key(description)
 
     def get_graph(self):
+        # graphs loaded from the cache or generated by the numpy backend
+        # are converted to networkx only when needed
+        if self.G is None:
+            self.G = self.csr.to_networkx()
         return self.G
 
+    def get_csr(self):
+        if self.csr is None:
+            self.csr = CSRGraph.from_networkx(self.G)
+        return self.csr
+
+    def create_random_csr(self, rng):
+        self.csr = generators.random_graph(self.n, self.params['p'], rng)
+
+    def create_ba_csr(self, rng):
+        self.csr = generators.ba_graph(self.n, self.params['m'], rng)
+
+    def create_ws_csr(self, rng):
+        self.csr = generators.ws_graph(self.n, self.params['k'], self.params['p'], rng)
+
+    def create_sb_csr(self, rng):
+        self.csr = generators.sb_graph(self.n, self.params['n_blocks'], self.params['p'], self.params['k'], rng)
+
+    def create_lattice_csr(self, rng):
+        self.csr = generators.lattice(self.params['m'], self.n)
+
     def create_random_graph(self):
         """
         Generating a random (Erdos-Renyi) network. 
@@ -58,7 +157,7 @@ class Network:
             Probability of creating edge between two nodes
         """
 
-        self.G = nx.fast_gnp_random_graph(self.n, self.params['p'])
+        self.G = nx.fast_gnp_random_graph(self.n, self.params['p'], seed=self.seed)
 
     def create_ba_graph(self):
         """
@@ -71,7 +170,7 @@ class Network:
             Number of edges to attach from a new node to existing ones
         """
 
-        self.G = nx.barabasi_albert_graph(self.n, self.params['m'])
+        self.G = nx.barabasi_albert_graph(self.n, self.params['m'], seed=self.seed)
 
     def create_ws_graph(self):
         """
@@ -86,7 +185,7 @@ class Network:
             Probability of rewiring: adding a new node and removing existing one
         """
 
-        self.G = nx.watts_strogatz_graph(self.n, self.params['k'], self.params['p'])
+        self.G = nx.watts_strogatz_graph(self.n, self.params['k'], self.params['p'], seed=self.seed)
 
     def create_sb_graph(self):
         """
@@ -104,7 +203,7 @@ class Network:
         probabilities = np.full((n_blocks, n_blocks), self.params['p'])
         np.fill_diagonal(probabilities, self.params['k'])
         block_sizes = [int(self.n/n_blocks) for _ in range(n_blocks)]
-        self.G = nx.stochastic_block_model(block_sizes, probabilities)
+        self.G = nx.stochastic_block_model(block_sizes, probabilities, seed=self.seed)
 
     def create_lattice(self):
         """
@@ -0,0 +1,38 @@
+class Observer:
+    """
+    Base of the objects the model calls after every step but which act only every k-th step:
+    the recorders, the online statistics and the stopping criteria.
+
+    Steps are counted from the start of the observer. The engines running many steps per call
+    skip the calls between two snapshots (advance) and use steps_to_snapshot to end their
+    chunks exactly at the next step at which the observer acts.
+
+    Attributes
+    ----------
+    every : int
+        Interval of the steps at which the observer acts
+    last_step : int
+        Number of the last step observed, -1 if the observer also acts at step 0 (its first call)
+
+    Methods
+    -------
+    observe_step : bool
+        Counts the next step and returns whether the observer acts at it
+    advance : None
+        Skips the given number of steps which were run without calling the observer
+    steps_to_snapshot : int
+        Returns the number of steps until the observer acts next
+    """
+    def __init__(self, every=1, last_step=-1):
+        self.every = every
+        self.last_step = last_step
+
+    def observe_step(self):
+        self.last_step += 1
+        return self.last_step % self.every == 0
+
+    def advance(self, step_count):
+        self.last_step += step_count
+
+    def steps_to_snapshot(self):
+        return self.every - self.last_step % self.every
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from .stats import compute_fractions_size, compute_mean_opinion
+from .Observer import Observer
+
+
+class OnlineStats(Observer):
+    """
+    Polarization statistics of the opinions computed while the model runs.
+
+    Every k-th step the mean, variance, number of opinions > 0 and a histogram of the opinions
+    of the whole population at that step are computed from the state array of the model in a
+    single vectorized pass and appended to a compact time series, so plots of these statistics
+    over time do not need the trajectory. Every opinion changes in every step, so each snapshot
+    is computed from scratch; "online" means that nothing but the series is stored.
+
+    Attributes
+    ----------
+    every : int
+        Interval of the steps at which the statistics are computed (step 0 included)
+    bin_edges : np.ndarray
+        Edges of the histogram bins, opinions outside the range are counted in the outer bins
+    steps : [ int ]
+        Steps of the snapshots
+
+    Methods
+    -------
+    collect : None
+        Called by the model every step
+    advance, steps_to_snapshot
+        See src/Observer.py
+    get_series : pd.DataFrame
+        Returns the time series indexed by step
+    get_histograms : np.ndarray
+        Returns (T, bins) array of histogram counts
+    series : np.ndarray
+        Returns the time series corresponding to a function from src/stats.py
+    """
+    # functions from src/stats.py which can be answered from the time series,
+    # their first returned value equals the given column
+    stat_columns = {compute_fractions_size: "fraction",
+                    compute_mean_opinion: "mean"}
+
+    def __init__(self, every=1, bins=20, range=(-2, 2)):
+        super().__init__(every)
+        self.bin_edges = np.linspace(range[0], range[1], bins + 1)
+        self.steps = []
+        self.columns = {"mean": [], "variance": [], "fraction": [], "n_plus": []}
+        self.histograms = []
+
+    def collect(self, model):
+        if self.observe_step():
+            self.observe(model.opinions)
+            self.steps.append(self.last_step)
+
+    def observe(self, opinions):
+        n = len(opinions)
+        mean = np.mean(opinions)
+        variance = np.var(opinions)
+        n_plus = int(np.count_nonzero(opinions > 0))
+        self.columns["mean"].append(mean)
+        self.columns["variance"].append(variance)
+        self.columns["fraction"].append(n_plus / n)
+        self.columns["n_plus"].append(n_plus)
+        bins = np.searchsorted(self.bin_edges[1:-1], opinions, side="right")
+        self.histograms.append(np.bincount(bins, minlength=len(self.bin_edges) - 1))
+
+    def get_series(self):
+        series = pd.DataFrame(self.columns, index=pd.Index(self.steps, name="Step"))
+        series["std"] = np.sqrt(series["variance"])
+        return series
+
+    def get_histograms(self):
+        return np.array(self.histograms)
+
+    def series(self, stat_function):
+        if stat_function not in self.stat_columns:
+            raise ValueError("Statistic is not computed online: " + str(stat_function))
+        return np.array(self.columns[self.stat_columns[stat_function]])
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from .SharedArrays import SharedArrays, attach
+from .dynamics import decay_attention, update_opinions
+
+# commands of the coordinator to the shard workers
+run_command = 0
+stop_command = 1
+
+
+class Partition:
+    """
+    Execution of the population updates of a single HIOM by shard worker processes.
+
+    The state arrays of the model are moved into shared memory and the nodes are split into
+    contiguous ranges (shards), one per worker process. The model acts as the coordinator: it
+    simulates the interactions of a batch of steps in advance (they touch only two agents each
+    and the attention decay is tracked by the sum-tree sampler) and writes them into a shared
+    event buffer. The workers then run the batch step by step on their shard, applying the events
+    of their nodes, decaying attention and updating opinions. Coordinator and workers meet at a
+    barrier at the start and at the end of every batch.
+
+    Shards do not read the state of their neighbours, so contiguous ranges are used for any
+    network; for "sb" networks with as many shards as blocks they are the blocks.
+
+    Attributes
+    ----------
+    shards : int
+        Number of worker processes
+    batch : int
+        Largest number of steps run between two synchronizations
+    bounds : np.ndarray
+        Shard i updates nodes bounds[i]..bounds[i+1]-1
+
+    Methods
+    -------
+    run : None
+        Runs a batch of steps with the given interaction events in the workers
+    close : None
+        Stops the workers and releases the shared memory
+    """
+    def __init__(self, model, shards=None, batch=1000):
+        if shards is None:
+            shards = os.cpu_count()
+        if shards < 1 or batch < 1:
+            raise ValueError("A partition needs at least one shard and one step per batch")
+        self.shards = shards
+        self.batch = batch
+        self.arrays = SharedArrays()
+        if not self.arrays.enabled:
+            raise ValueError("The partitioned engine needs multiprocessing.shared_memory (Python 3.8)")
+        descriptors = {}
+        for name in ("opinions", "attentions", "informations"):
+            array, descriptors[name] = self.arrays.create(len(getattr(model, name)), np.float64)
+            array[:] = getattr(model, name)
+            setattr(model, name, array)
+        # step, active, attention of active, neighbour, attention of neighbour, information
+        self.events, descriptors["events"] = self.arrays.create((batch, 6), np.float64)
+        # command, step count, event count, seed of the batch
+        self.control, descriptors["control"] = self.arrays.create(4, np.int64, fill=0)
+        self.bounds = np.linspace(0, len(model.opinions), shards + 1).astype(np.int64)
+
+        params = {
+            "attention_delta": model.attention_delta,
+            "population": model.population,
+            "a_min": model.a_min,
+            "dt": model.dt,
+            "sd_opinion": model.sd_opinion
+        }
+        self.barrier = multiprocessing.Barrier(shards + 1)
+        self.processes = []
+        for shard in range(shards):
+            process = multiprocessing.Process(
+                target=shard_worker,
+                args=(descriptors, shard, self.bounds[shard], self.bounds[shard + 1], params, self.barrier),
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        # workers and shared memory are released when the model is closed or garbage collected
+        self.finalizer = weakref.finalize(self, shutdown, self.control, self.barrier, self.processes, self.arrays)
+
+    def run(self, step_count, events, seed):
+        if step_count > self.batch:
+            raise ValueError("A batch has at most {} steps".format(self.batch))
+        self.events[:len(events)] = events
+        self.control[:] = (run_command, step_count, len(events), seed)
+        try:
+            self.barrier.wait()
+            self.barrier.wait()
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("A shard worker of the partitioned engine failed")
+
+    def close(self):
+        self.finalizer()
+
+
+def shutdown(control, barrier, processes, arrays):
+    # stops the workers waiting at the barrier, they are terminated if that fails
+    control[0] = stop_command
+    try:
+        barrier.wait(timeout=10)
+    except threading.BrokenBarrierError:
+        pass
+    for process in processes:
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+    arrays.close()
+
+
+def shard_worker(descriptors, shard, start, stop, params, barrier):
+    # loop of a worker process updating the nodes start..stop-1
+    opinions = attach(descriptors["opinions"])[start:stop]
+    attentions = attach(descriptors["attentions"])[start:stop]
+    informations = attach(descriptors["informations"])[start:stop]
+    events = attach(descriptors["events"])
+    control = attach(descriptors["control"])
+    try:
+        while True:
+            barrier.wait()
+            if control[0] == stop_command:
+                return
+            step_count, event_count, seed = (int(value) for value in control[1:])
+            # every shard has its own stream, derived from the seed of the batch
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard,)))
+            batch_events = events[:event_count].tolist()
+            next_event = 0
+            for step in range(step_count):
+                while next_event < event_count and batch_events[next_event][0] == step:
+                    _, active, a_active, neighbour, a_neighbour, information = batch_events[next_event]
+                    if start <= active < stop:
+                        attentions[int(active) - start] = a_active
+                    if start <= neighbour < stop:
+                        attentions[int(neighbour) - start] = a_neighbour
+                        informations[int(neighbour) - start] = information
+                    next_event += 1
+                decay_attention(attentions, params["attention_delta"], params["population"])
+                update_opinions(opinions, attentions, informations, params["a_min"], params["dt"],
+                                params["sd_opinion"], rng)
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        return
+    except Exception:
+        barrier.abort()
+        raise
@@ -0,0 +1,86 @@
+import time
+import tracemalloc
+
+
+class Profiler:
+    """
+    Wall time and call counts of the phases of the model step.
+
+    The model replaces its methods of every phase with wrappers created by wrap, so a model
+    without a profiler runs the plain methods and pays nothing. Times are exclusive: when a timed
+    call contains other timed calls (e.g. Agent.interact inside the agent engine step), their time
+    is counted only in their own phase.
+
+    Attributes
+    ----------
+    times : dict
+        Accumulated seconds of every phase
+    calls : dict
+        Number of calls of every phase
+    memory_every : int
+        If given, traced memory (tracemalloc) is sampled after every k-th collection, i.e. step.
+        Tracing all allocations slows the run down considerably.
+    memory : [ (int, int) ]
+        Samples of (step, traced bytes)
+
+    Methods
+    -------
+    wrap : function
+        Returns a timed version of a function counted in the given phase
+    report : dict
+        Returns times, calls and shares of all phases and the memory samples
+    """
+    # phases timed by HIOM
+    phases = ("choose", "interact", "update", "collect")
+
+    def __init__(self, memory_every=None):
+        self.times = {}
+        self.calls = {}
+        self.memory_every = memory_every
+        self.memory = []
+        self.collections = 0
+        # time of the timed calls nested in each of the currently running ones
+        self.nested = [0.0]
+        if memory_every is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def wrap(self, phase, function, sample=False):
+        self.times.setdefault(phase, 0.0)
+        self.calls.setdefault(phase, 0)
+
+        def timed(*args, **kwargs):
+            self.nested.append(0.0)
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            children = self.nested.pop()
+            self.nested[-1] += elapsed
+            self.times[phase] += elapsed - children
+            self.calls[phase] += 1
+            if sample:
+                self.sample_memory()
+            return result
+        return timed
+
+    def sample_memory(self):
+        if self.memory_every is not None and self.collections % self.memory_every == 0:
+            self.memory.append((self.collections, tracemalloc.get_traced_memory()[0]))
+        self.collections += 1
+
+    def report(self):
+        total = sum(self.times.values())
+        report = {
+            phase: {
+                "seconds": seconds,
+                "calls": self.calls[phase],
+                "per_call": seconds / self.calls[phase] if self.calls[phase] else 0.0,
+                "share": seconds / total if total > 0 else 0.0
+            }
+            for phase, seconds in self.times.items()
+        }
+        if self.memory_every is not None:
+            report["memory"] = {
+                "samples": list(self.memory),
+                "peak": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            }
+        return report
@@ -0,0 +1,285 @@
+import json
+import weakref
+import numpy as np
+import pandas as pd
+
+from .Observer import Observer
+
+
+class Recorder(Observer):
+    """
+    A columnar replacement of the mesa DataCollector.
+
+    Opinions, attentions and informations are copied from the state arrays of the model into
+    preallocated (T, N) arrays, so a snapshot costs one array copy instead of 3*N Python lists.
+    Snapshots can be taken only every k-th step, or only population aggregates can be kept.
+
+    Attributes
+    ----------
+    every : int
+        Snapshot interval, a snapshot is taken every k-th step (step 0 included)
+    aggregate : bool
+        If True, only mean and standard deviation of every quantity and the fraction of
+        opinions > 0 are recorded instead of full snapshots
+    dtype : string or np.dtype
+        Type of the recorded values, e.g. "float64" or "float32"
+
+    Methods
+    -------
+    collect : None
+        Called by the model every step, records a snapshot every k-th call
+    advance, steps_to_snapshot
+        See src/Observer.py
+    reserve : None
+        Preallocates space for the given number of further steps
+    steps : np.ndarray
+        Returns model steps at which the snapshots were taken
+    get_model_vars_dataframe : dict
+        Compatibility accessor, returns the recorded trajectories in the format of the DataCollector
+    get_aggregates : pd.DataFrame
+        Returns aggregates recorded in the aggregate mode, indexed by step
+    """
+    quantities = {"Opinion": "opinions",
+                  "Attention": "attentions",
+                  "Information": "informations"}
+
+    def __init__(self, model, every=1, aggregate=False, dtype="float64"):
+        super().__init__(every)
+        self.aggregate = aggregate
+        self.dtype = np.dtype(dtype)
+        self.n = len(model.opinions)
+        self.size = 0
+        self.data = {}
+        self.reserve(0)
+
+    def columns(self):
+        if not self.aggregate:
+            return list(self.quantities)
+        columns = []
+        for name in self.quantities:
+            columns += [name + " mean", name + " std"]
+        return columns + ["Opinion fraction"]
+
+    def capacity(self):
+        return len(self.data[self.columns()[0]]) if self.data else 0
+
+    def reserve(self, step_count):
+        # upper bound on the number of snapshots including the ones taken so far
+        needed = self.size + step_count // self.every + 1
+        if needed <= self.capacity():
+            return
+        for name in self.columns():
+            shape = (needed, self.n) if not self.aggregate else (needed,)
+            column = np.empty(shape, dtype=self.dtype)
+            if name in self.data:
+                column[:self.size] = self.data[name][:self.size]
+            self.data[name] = column
+
+    def collect(self, model):
+        if self.observe_step():
+            if self.size == self.capacity():
+                # grow geometrically when steps were not reserved in advance
+                self.reserve(max(self.capacity(), 1) * self.every)
+            if self.aggregate:
+                self.record_aggregates(model)
+            else:
+                for name, attribute in self.quantities.items():
+                    self.data[name][self.size] = getattr(model, attribute)
+            self.size += 1
+
+    def record_aggregates(self, model):
+        for name, attribute in self.quantities.items():
+            values = getattr(model, attribute)
+            self.data[name + " mean"][self.size] = np.mean(values)
+            self.data[name + " std"][self.size] = np.std(values)
+        self.data["Opinion fraction"][self.size] = np.count_nonzero(model.opinions > 0) / self.n
+
+    def steps(self):
+        return np.arange(self.size) * self.every
+
+    def get_model_vars_dataframe(self):
+        """
+        Mimics DataCollector.get_model_vars_dataframe. Instead of a dataframe of Python lists
+        a dictionary of lazy views is returned, indexing a view with a snapshot number gives
+        the [[id, value], ...] array expected by the functions in src/stats.py and src/plotter.py.
+        """
+        if self.aggregate:
+            raise ValueError("Only aggregates were recorded, use get_aggregates()")
+        return {name: TrajectoryView(self.data[name][:self.size]) for name in self.quantities}
+
+    def get_aggregates(self):
+        if not self.aggregate:
+            raise ValueError("Full snapshots were recorded, use get_model_vars_dataframe()")
+        columns = {name: self.data[name][:self.size] for name in self.columns()}
+        return pd.DataFrame(columns, index=pd.Index(self.steps(), name="Step"))
+
+
+class TrajectoryView:
+    """
+    Read-only sequence of snapshots backed by a (T, N) array.
+
+    Item i is a (N, 2) array of [unique_id, value] rows, the same layout as a single step
+    collected by the DataCollector of the model. Agent ids are 1..N in the order of the
+    state arrays of the model.
+    """
+    def __init__(self, values):
+        self.values = values
+        self.ids = np.arange(1, values.shape[1] + 1)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if not -len(self.values) <= i < len(self.values):
+            raise IndexError("Snapshot index out of range")
+        return np.column_stack((self.ids, self.values[i]))
+
+
+class DiskRecorder(Observer):
+    """
+    Recorder streaming snapshots to an append-only binary file instead of keeping them in memory.
+
+    The file starts with a small header (magic bytes, header length and a JSON description of
+    dtype, population size, snapshot interval and recorded quantities) followed by one row of
+    (quantities, N) values per snapshot. It can be opened lazily with load_trajectory at any
+    time, also while the model is still running.
+
+    Attributes
+    ----------
+    path : string
+        Path of the trajectory file, it is overwritten if it exists
+    every : int
+        Snapshot interval, a snapshot is taken every k-th step (step 0 included)
+    dtype : string or np.dtype
+        Type of the recorded values
+
+    Methods
+    -------
+    collect : None
+        Called by the model every step, appends a snapshot every k-th call
+    advance, steps_to_snapshot
+        See src/Observer.py
+    reserve : None
+        Does nothing, the file grows as needed
+    flush : None
+        Writes buffered snapshots to the file
+    close : None
+        Closes the file, also done at the end of a with block and on garbage collection
+    steps : np.ndarray
+        Returns model steps at which the snapshots were taken
+    get_model_vars_dataframe : dict
+        Compatibility accessor, see Recorder.get_model_vars_dataframe
+    """
+    magic = b"HIOMTRJ1"
+
+    def __init__(self, model, path, every=1, dtype="float32"):
+        super().__init__(every)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.n = len(model.opinions)
+        self.size = 0
+        header = json.dumps({
+            "dtype": self.dtype.str,
+            "n": self.n,
+            "every": every,
+            "quantities": list(Recorder.quantities)
+        }).encode()
+        # data starts at a 64 byte boundary so the file can be memory mapped efficiently
+        offset = len(self.magic) + 4 + len(header)
+        header += b" " * (-offset % 64)
+        self.file = open(path, "wb")
+        # the file is closed by close, at the end of a with block, or when the recorder is
+        # garbage collected, so snapshots written so far are never lost
+        self.finalizer = weakref.finalize(self, self.file.close)
+        self.file.write(self.magic)
+        self.file.write(np.uint32(len(header)).tobytes())
+        self.file.write(header)
+        self.row = np.empty((len(Recorder.quantities), self.n), dtype=self.dtype)
+
+    def reserve(self, step_count):
+        pass
+
+    def collect(self, model):
+        if self.observe_step():
+            for i, attribute in enumerate(Recorder.quantities.values()):
+                self.row[i] = getattr(model, attribute)
+            self.file.write(self.row.tobytes())
+            self.size += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def steps(self):
+        return np.arange(self.size) * self.every
+
+    def get_model_vars_dataframe(self):
+        self.flush()
+        return load_trajectory(self.path).get_model_vars_dataframe()
+
+
+class Trajectory:
+    """
+    Trajectory stored by DiskRecorder, opened as a read-only memory map.
+
+    Nothing is loaded into memory until the snapshots are accessed, so long runs can be analysed
+    after the fact. opinions, attentions and informations are (T, N) arrays which can be passed
+    directly to the functions in src/stats.py (per snapshot) and src/plotter.py.
+
+    Attributes
+    ----------
+    data : np.memmap
+        All snapshots, shape (T, quantities, N)
+    every : int
+        Snapshot interval of the recorded run
+    opinions, attentions, informations : np.ndarray
+        (T, N) views of the recorded quantities
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(DiskRecorder.magic)) != DiskRecorder.magic:
+                raise ValueError("Not a HIOM trajectory file: " + str(path))
+            header_length = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            header = json.loads(f.read(header_length).decode())
+            offset = f.tell()
+            f.seek(0, 2)
+            file_size = f.tell()
+        dtype = np.dtype(header["dtype"])
+        self.n = header["n"]
+        self.every = header["every"]
+        self.quantities = header["quantities"]
+        row_size = len(self.quantities) * self.n * dtype.itemsize
+        # an incompletely written last snapshot is ignored
+        length = (file_size - offset) // row_size
+        shape = (length, len(self.quantities), self.n)
+        if length == 0:
+            self.data = np.empty(shape, dtype=dtype)
+        else:
+            self.data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        self.opinions = self["Opinion"]
+        self.attentions = self["Attention"]
+        self.informations = self["Information"]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, name):
+        return self.data[:, self.quantities.index(name), :]
+
+    def steps(self):
+        return np.arange(len(self.data)) * self.every
+
+    def get_model_vars_dataframe(self):
+        return {name: TrajectoryView(self[name]) for name in self.quantities}
+
+
+def load_trajectory(path):
+    return Trajectory(path)
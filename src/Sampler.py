@@ -0,0 +1,142 @@
+import numpy as np
+
+
+class LinearSampler:
+    """
+    Attention-proportional choice of the active agent by a scan over all attentions.
+
+    Every draw costs O(N), but there is no state to keep in sync with the model.
+
+    Methods
+    -------
+    sample : int
+        Returns index of the chosen agent
+    sample_many : np.ndarray
+        Returns indices of k independently chosen agents
+    decay, update, rebuild
+        Notifications about attention changes, ignored by this sampler
+    """
+    def __init__(self, attentions, rng):
+        self.attentions = attentions
+        self.rng = rng
+
+    def sample(self):
+        cumulative = np.cumsum(self.attentions)
+        index = np.searchsorted(cumulative, self.rng.random() * cumulative[-1], side="right")
+        return min(index, len(cumulative) - 1)
+
+    def sample_many(self, k):
+        # k independent draws from a single scan
+        cumulative = np.cumsum(self.attentions)
+        indices = np.searchsorted(cumulative, self.rng.random(k) * cumulative[-1], side="right")
+        return np.minimum(indices, len(cumulative) - 1)
+
+    def decay(self, factor):
+        pass
+
+    def update(self, index, value):
+        pass
+
+    def rebuild(self, attentions):
+        pass
+
+
+class SumTreeSampler:
+    """
+    Attention-proportional choice of the active agent using a Fenwick (binary indexed) tree.
+
+    All attentions decay by the same factor every step, so instead of touching every weight the
+    sampler keeps a global scale: attention of agent i equals scale * weights[i]. Only the agents
+    taking part in an interaction have to be updated, which together with the draw costs O(log N).
+
+    Attributes
+    ----------
+    weights : [ float ]
+        Unscaled attention of every agent
+    tree : [ float ]
+        Fenwick tree over weights (1-based)
+    scale : float
+        Common factor of all weights
+    total : float
+        Sum of all weights
+
+    Methods
+    -------
+    sample : int
+        Returns index of the chosen agent
+    sample_many : np.ndarray
+        Returns indices of k independently chosen agents in O(k log N)
+    decay : None
+        Multiplies all attentions by the given factor in O(1)
+    update : None
+        Sets attention of a single agent in O(log N)
+    rebuild : None
+        Builds the tree again from all attentions in O(N)
+    """
+    # the weights are renormalized before the scale can underflow
+    min_scale = 1e-150
+
+    def __init__(self, attentions, rng):
+        self.rng = rng
+        self.n = len(attentions)
+        self.top_bit = 1 << (self.n.bit_length() - 1)
+        self.rebuild(np.asarray(attentions, dtype=np.float64))
+
+    def rebuild(self, attentions):
+        # vectorized O(N) construction: every level of the tree adds
+        # its nodes to their parents in a single array operation
+        tree = np.zeros(self.n + 1)
+        tree[1:] = attentions
+        level = 1
+        while level <= self.n:
+            children = np.arange(level, self.n + 1, 2 * level)
+            parents = children + level
+            valid = parents <= self.n
+            tree[parents[valid]] += tree[children[valid]]
+            level *= 2
+        self.weights = attentions.tolist()
+        self.tree = tree.tolist()
+        self.total = float(np.sum(attentions))
+        self.scale = 1.0
+        # rounding errors of the incremental updates are
+        # discarded by rebuilding the tree every n updates
+        self.updates_left = self.n
+
+    def sample(self):
+        target = self.rng.random() * self.total
+        tree = self.tree
+        position = 0
+        step = self.top_bit
+        while step > 0:
+            child = position + step
+            if child <= self.n and tree[child] <= target:
+                position = child
+                target -= tree[child]
+            step >>= 1
+        return min(position, self.n - 1)
+
+    def sample_many(self, k):
+        return np.array([self.sample() for _ in range(k)], dtype=np.int64)
+
+    def decay(self, factor):
+        self.scale *= factor
+        if self.scale < self.min_scale:
+            self.rebuild(np.array(self.weights) * self.scale)
+
+    def update(self, index, value):
+        weight = value / self.scale
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        tree = self.tree
+        i = index + 1
+        while i <= self.n:
+            tree[i] += delta
+            i += i & -i
+        self.updates_left -= 1
+        if self.updates_left <= 0:
+            self.rebuild(np.array(self.weights) * self.scale)
+
+
+samplers = {"linear": LinearSampler,
+            "sumtree": SumTreeSampler}
@@ -0,0 +1,146 @@
+import ctypes
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # multiprocessing.shared_memory needs Python 3.8
+    shared_memory = None
+
+from .Graph import CSRGraph
+
+shared_memory_available = shared_memory is not None
+
+# blocks attached by this process, they stay open while the process lives
+attached = {}
+
+
+class SharedArrays:
+    """
+    Owner of arrays shared with worker processes, e.g. the network and the result buffers of a sweep.
+
+    Every array lives in its own multiprocessing.shared_memory block and is described by a small
+    picklable descriptor (block name, shape and dtype), which a worker passes to attach to get a
+    view of the same memory instead of a copy. Only the owner unlinks the blocks, when close is
+    called or the with block is left, also when a worker failed. Without shared memory (enabled
+    is False, e.g. if everything runs in this process, or before Python 3.8) the descriptors
+    contain the arrays themselves.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether the arrays are created in shared memory
+
+    Methods
+    -------
+    create : (np.ndarray, dict)
+        Returns a new array of the given shape and dtype and its descriptor
+    share : dict
+        Returns the descriptor of a shared copy of an array
+    close : None
+        Releases and unlinks all blocks
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled and shared_memory_available
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def create(self, shape, dtype, fill=None):
+        shape = tuple(int(size) for size in np.atleast_1d(shape))
+        dtype = np.dtype(dtype)
+        if self.enabled:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            self.blocks.append(block)
+            array = view(block, shape, dtype)
+            descriptor = {"name": block.name, "shape": shape, "dtype": dtype.str}
+        else:
+            array = np.empty(shape, dtype=dtype)
+            descriptor = {"array": array}
+        if fill is not None:
+            array[...] = fill
+        return array, descriptor
+
+    def share(self, values):
+        values = np.asarray(values)
+        if not self.enabled:
+            return {"array": values}
+        array, descriptor = self.create(values.shape, values.dtype)
+        array[...] = values
+        return descriptor
+
+    def close(self):
+        for block in self.blocks:
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # arrays on the block are still in use, it is closed when they are released
+                pass
+        self.blocks = []
+
+
+def attach(descriptor):
+    """
+    Function to get the array described by a descriptor of SharedArrays.
+    """
+    if "array" in descriptor:
+        return descriptor["array"]
+    name = descriptor["name"]
+    if name not in attached:
+        attached[name] = shared_memory.SharedMemory(name=name)
+    return view(attached[name], descriptor["shape"], descriptor["dtype"])
+
+
+class BlockBuffer:
+    """
+    Memory of a block exposed to numpy. It is the base of the arrays on the block and keeps the
+    block open while any of them (or a view of them) exists, so closing the block before that
+    fails instead of leaving the arrays pointing to unmapped memory.
+    """
+    def __init__(self, block, shape, dtype):
+        self.block = block
+        self.pointer = ctypes.c_char.from_buffer(block.buf)
+        self.__array_interface__ = {
+            "data": (ctypes.addressof(self.pointer), False),
+            "shape": tuple(shape),
+            "typestr": np.dtype(dtype).str,
+            "version": 3
+        }
+
+    def __del__(self):
+        # the export of the block is released first, so that the block can be closed
+        del self.pointer
+
+
+def view(block, shape, dtype):
+    return np.asarray(BlockBuffer(block, shape, dtype))
+
+
+def share_graph(arrays, graph):
+    """
+    Function to share the CSR arrays of a graph, returns a descriptor for attach_graph.
+    Node labels other than 0..n-1 (e.g. of social media graphs) are kept in the descriptor.
+    """
+    return {
+        "indptr": arrays.share(graph.indptr),
+        "indices": arrays.share(graph.indices),
+        "nodes": None if isinstance(graph.nodes, range) else list(graph.nodes)
+    }
+
+
+def attach_graph(descriptor):
+    """
+    Function to get a read-only CSRGraph on the arrays shared by share_graph.
+    """
+    indptr = attach(descriptor["indptr"]).view()
+    indices = attach(descriptor["indices"]).view()
+    indptr.flags.writeable = False
+    indices.flags.writeable = False
+    return CSRGraph(indptr, indices, descriptor["nodes"])
@@ -0,0 +1,82 @@
+import numpy as np
+
+from .Observer import Observer
+
+
+class StoppingCriteria(Observer):
+    """
+    Convergence checks used by HIOM.run_model to stop a run before its step budget.
+
+    Every k-th step a few cheap metrics are computed from the state arrays of the model and
+    compared with the previous check. The run stops when one of the given criteria has held for
+    patience consecutive checks, the name of that criterion is the reason of the stop.
+
+    Criteria (thresholds, None disables a criterion)
+    --------
+    mean_change : float
+        Absolute change of the mean opinion since the last check is below the threshold
+    fraction_change : float
+        Absolute change of the fraction of opinions > 0 since the last check is below the threshold
+    attention_below : float
+        Total attention of the population is below the threshold, i.e. nobody is interacting
+
+    Attributes
+    ----------
+    every : int
+        Interval of the steps at which the criteria are checked
+    patience : int
+        Number of consecutive checks a criterion has to hold
+
+    Methods
+    -------
+    check : string or None
+        Called by the model after every step, returns the name of the criterion met or None
+    advance, steps_to_snapshot
+        See src/Observer.py
+    """
+    def __init__(self, every=10, patience=1, mean_change=None, fraction_change=None, attention_below=None):
+        # the start of the run counts as observed, the first check is after every steps
+        super().__init__(every, last_step=0)
+        self.patience = patience
+        thresholds = {"mean_change": mean_change,
+                      "fraction_change": fraction_change,
+                      "attention_below": attention_below}
+        self.thresholds = {name: value for name, value in thresholds.items() if value is not None}
+        if not self.thresholds:
+            raise ValueError("No stopping criterion given")
+        self.criteria = {"mean_change": self.mean_converged,
+                         "fraction_change": self.fraction_converged,
+                         "attention_below": self.attention_quiet}
+        self.streaks = {name: 0 for name in self.thresholds}
+        self.previous = None
+        self.current = None
+
+    def check(self, model):
+        if not self.observe_step():
+            return None
+        opinions = model.opinions
+        self.current = {
+            "mean": float(np.mean(opinions)),
+            "fraction": np.count_nonzero(opinions > 0) / len(opinions),
+            "attention": float(np.sum(model.attentions))
+        }
+        reason = None
+        for name, threshold in self.thresholds.items():
+            if self.criteria[name](threshold):
+                self.streaks[name] += 1
+            else:
+                self.streaks[name] = 0
+            if reason is None and self.streaks[name] >= self.patience:
+                reason = name
+        self.previous = self.current
+        return reason
+
+
+    def mean_converged(self, threshold):
+        return self.previous is not None and abs(self.current["mean"] - self.previous["mean"]) < threshold
+
+    def fraction_converged(self, threshold):
+        return self.previous is not None and abs(self.current["fraction"] - self.previous["fraction"]) < threshold
+
+    def attention_quiet(self, threshold):
+        return self.current["attention"] < threshold
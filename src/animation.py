@@ -0,0 +1,318 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib import cm, colors
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+from src.stats import raw_values
+from src.Recorder import TrajectoryView, load_trajectory
+
+"""
+File contains the renderer of the animations of src/plotter.py. Frames are read from (T, N) arrays
+(array recorder, trajectory files, or the DataCollector output, which is converted frame by frame),
+colours are taken from a lookup table in one indexing operation, and only the animated artists are
+redrawn on top of a cached background. Frame ranges are rendered by worker processes into temporary
+segments, which are stitched into one GIF (Pillow) or MP4 (ffmpeg) file.
+"""
+
+
+def lut_index(values, vmin, vmax, size=255):
+    """
+    Function to map values to entries of a lookup table of the given size, values outside of
+    [vmin, vmax] get the first or the last entry. Equal to the colours of a matplotlib colormap
+    with size entries at (value - vmin) / (vmax - vmin).
+    """
+    scaled = (np.asarray(values, dtype=np.float64) - vmin) * (size / (vmax - vmin))
+    return np.clip(scaled, 0, size - 1).astype(np.intp)
+
+
+def agg_figure(size, dpi):
+    figure = Figure(figsize=size, dpi=dpi)
+    return figure, FigureCanvasAgg(figure)
+
+
+def frame_pixels(canvas):
+    # the renderer buffer, valid until the next frame is drawn
+    return np.asarray(canvas.buffer_rgba())
+
+
+def opinion_vs_info_renderer(n, size=(6.4, 4.8), dpi=100, cmap="jet", alpha=0.5):
+    """
+    Scatter of opinion against information coloured by attention (0 to 2), as opinion_vs_info_gif.
+    Returns a function drawing one frame and returning its (height, width, 4) pixels.
+    """
+    figure, canvas = agg_figure(size, dpi)
+    ax = figure.add_subplot(1, 1, 1, xlim=(-2, 2), ylim=(-2, 2))
+    ax.set_xlabel("Information")
+    ax.set_ylabel("Opinion")
+    c_map = cm.get_cmap(cmap, 255)
+    lut = c_map(np.arange(255))
+    lut[:, 3] = alpha
+    mappable = cm.ScalarMappable(norm=colors.Normalize(0, 2), cmap=c_map)
+    mappable.set_array(np.array([]))
+    legend = figure.colorbar(mappable, ax=ax)
+    legend.set_label("Attention", labelpad=-20, y=1.1, rotation=0)
+    scat = ax.scatter(np.zeros(n), np.zeros(n), animated=True)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+    offsets = np.empty((n, 2))
+
+    def render(opinions, informations, attentions):
+        offsets[:, 0] = informations
+        offsets[:, 1] = opinions
+        scat.set_offsets(offsets)
+        rgba = lut[lut_index(attentions, 0, 2)]
+        scat.set_facecolors(rgba)
+        scat.set_edgecolors(rgba)
+        canvas.restore_region(background)
+        ax.draw_artist(scat)
+        return frame_pixels(canvas)
+    return render
+
+
+def opinion_distribution_renderer(n, size=(6.4, 4.8), dpi=100, bins=10, value_range=(-2, 2), ylim=None):
+    """
+    Histogram of the opinions, as plot_opinion_distribution_animation. The bars are created once
+    and only their heights change, ylim defaults to the population size.
+    Returns a function drawing one frame and returning its (height, width, 4) pixels.
+    """
+    figure, canvas = agg_figure(size, dpi)
+    ax = figure.add_subplot(1, 1, 1, xlim=value_range, ylim=(0, n if ylim is None else ylim))
+    ax.set_xlabel("Opinion")
+    ax.set_ylabel("Number of people")
+    edges = np.linspace(value_range[0], value_range[1], bins + 1)
+    bars = ax.bar(edges[:-1], np.zeros(bins), width=np.diff(edges), align="edge", animated=True)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+
+    def render(opinions, informations, attentions):
+        counts, _ = np.histogram(opinions, bins=bins, range=value_range)
+        canvas.restore_region(background)
+        for bar, count in zip(bars, counts):
+            bar.set_height(count)
+            ax.draw_artist(bar)
+        return frame_pixels(canvas)
+    return render
+
+
+renderers = {
+    "opinion_vs_info": opinion_vs_info_renderer,
+    "opinion_distribution": opinion_distribution_renderer
+}
+
+
+def select_frames(values, frames):
+    """
+    Function to read the given frames of a trajectory as a (k, N) array.
+
+    Arguments
+    ---------
+    values : np.ndarray, TrajectoryView or sequence of snapshots
+        A (T, N) array (array recorder, trajectory file), a view returned by
+        get_model_vars_dataframe, or snapshots in any format accepted by raw_values
+    frames : np.ndarray
+        Indices of the frames
+    """
+    if isinstance(values, TrajectoryView):
+        values = values.values
+    if isinstance(values, np.ndarray) and values.ndim == 2:
+        return np.asarray(values[frames], dtype=np.float64)
+    return np.stack([raw_values(values[int(frame)]) for frame in frames])
+
+
+def render_segment(task):
+    # a range of frames rendered by a worker process into a temporary segment file
+    frames = task["frames"]
+    if task["path"] is not None:
+        trajectory = load_trajectory(task["path"])
+        data = [select_frames(values, frames) for values in
+                (trajectory.opinions, trajectory.informations, trajectory.attentions)]
+    else:
+        data = task["data"]
+    opinions, informations, attentions = data
+    render = renderers[task["kind"]](opinions.shape[1], **task["options"])
+
+    writer = None
+    for i in range(len(frames)):
+        pixels = render(opinions[i],
+                        None if informations is None else informations[i],
+                        None if attentions is None else attentions[i])
+        if writer is None:
+            writer = segment_writers[task["format"]](task["output"], len(frames), pixels.shape, task["fps"])
+        writer.send(pixels)
+    writer.close()
+    return task["output"]
+
+
+def gif_segment_writer(output, frame_count, shape, fps):
+    """
+    Quantizes frames to 256 colours and stores the palette indices in an .npy file, so the
+    expensive part of the GIF encoding runs in the workers.
+    """
+    indices = np.lib.format.open_memmap(output + ".npy", mode="w+", dtype=np.uint8, shape=(frame_count,) + shape[:2])
+    palettes = np.zeros((frame_count, 768), dtype=np.uint8)
+    i = 0
+    try:
+        while True:
+            pixels = yield
+            height, width = pixels.shape[:2]
+            image = Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+            image = image.convert("RGB").quantize(256, method=2)
+            indices[i] = np.asarray(image)
+            palette = image.getpalette()[:768]
+            palettes[i, :len(palette)] = palette
+            i += 1
+    finally:
+        indices.flush()
+        np.save(output + "_palette.npy", palettes)
+
+
+def mp4_segment_writer(output, frame_count, shape, fps):
+    """
+    Pipes raw frames to an ffmpeg process encoding one H.264 segment.
+    """
+    height, width = shape[:2]
+    process = subprocess.Popen(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba",
+         "-s", "{}x{}".format(width, height), "-r", str(fps), "-i", "-",
+         "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-pix_fmt", "yuv420p", "-vcodec", "libx264",
+         output + ".mp4"],
+        stdin=subprocess.PIPE
+    )
+    try:
+        while True:
+            pixels = yield
+            process.stdin.write(pixels.tobytes())
+    finally:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError("ffmpeg failed to encode " + output + ".mp4")
+
+
+def primed(generator_function):
+    def start(*args):
+        generator = generator_function(*args)
+        next(generator)
+        return generator
+    return start
+
+
+segment_writers = {
+    "gif": primed(gif_segment_writer),
+    "mp4": primed(mp4_segment_writer)
+}
+
+
+def gif_frames(segments):
+    for segment in segments:
+        indices = np.load(segment + ".npy", mmap_mode="r")
+        palettes = np.load(segment + "_palette.npy")
+        for frame, palette in zip(indices, palettes):
+            image = Image.fromarray(np.array(frame))
+            image.putpalette(palette.tobytes())
+            yield image
+
+
+def stitch_gif(path, segments, fps):
+    images = gif_frames(segments)
+    first = next(images)
+    first.save(path, save_all=True, append_images=images, duration=int(round(1000 / fps)), loop=0,
+               optimize=False)
+
+
+def stitch_mp4(path, segments, fps):
+    directory = os.path.dirname(segments[0])
+    listing = os.path.join(directory, "segments.txt")
+    with open(listing, "w") as f:
+        for segment in segments:
+            f.write("file '{}'\n".format(segment + ".mp4"))
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing,
+                    "-c", "copy", path], check=True)
+
+
+stitchers = {
+    "gif": stitch_gif,
+    "mp4": stitch_mp4
+}
+
+
+def save_animation(path, opinions, informations=None, attentions=None, kind="opinion_vs_info", fps=30,
+                   stride=1, start=0, stop=None, processes=None, **options):
+    """
+    Function to render an animation of a trajectory into a GIF or MP4 file.
+
+    Arguments
+    ---------
+    path : string
+        Output file, the format is given by its extension (.gif or .mp4, which needs ffmpeg)
+    opinions, informations, attentions
+        Trajectories in any format accepted by select_frames, or opinions can be the path of a
+        trajectory file written by the disk recorder, which every worker then opens as a memory map
+    kind : string
+        "opinion_vs_info" (needs all three quantities) or "opinion_distribution" (opinions only)
+    fps : int
+        Frames per second of the animation
+    stride, start, stop : int
+        Every stride-th frame from start up to stop (exclusive, default all) is rendered
+    processes : int
+        Number of worker processes, None uses all cores, 1 renders everything in this process
+    options
+        Passed to the renderer, e.g. size, dpi, cmap, bins, ylim
+
+    Returns
+    -------
+    frame_count : int
+        Number of rendered frames
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension not in stitchers:
+        raise ValueError("Unknown animation format: " + str(path))
+    if kind not in renderers:
+        raise ValueError("Unknown animation kind: " + str(kind))
+    if extension == "mp4" and shutil.which("ffmpeg") is None:
+        raise ValueError("Writing MP4 files requires ffmpeg")
+
+    trajectory_path = None
+    if isinstance(opinions, str):
+        trajectory_path = opinions
+        opinions = load_trajectory(trajectory_path).opinions
+    elif kind == "opinion_vs_info" and (informations is None or attentions is None):
+        raise ValueError("opinion_vs_info needs opinions, informations and attentions")
+    if kind == "opinion_distribution":
+        informations, attentions = None, None
+
+    frames = np.arange(len(opinions))[start:stop:stride]
+    if len(frames) == 0:
+        raise ValueError("No frames to render")
+    if processes is None:
+        processes = os.cpu_count()
+    processes = min(processes, len(frames))
+
+    with tempfile.TemporaryDirectory() as directory:
+        tasks = []
+        for i, segment in enumerate(np.array_split(frames, processes)):
+            tasks.append({
+                "kind": kind,
+                "frames": segment,
+                "path": trajectory_path,
+                "data": None if trajectory_path is not None else [
+                    None if values is None else select_frames(values, segment)
+                    for values in (opinions, informations, attentions)],
+                "options": options,
+                "format": extension,
+                "fps": fps,
+                "output": os.path.join(directory, "segment{:04d}".format(i))
+            })
+        if processes == 1:
+            segments = [render_segment(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                segments = list(executor.map(render_segment, tasks))
+        stitchers[extension](path, segments, fps)
+    return len(frames)
@@ -0,0 +1,220 @@
+import os
+import numpy as np
+
+"""
+File contains a fast implementation of Hartigan's dip statistic for batch evaluation.
+
+The statistic is computed with the O(n) algorithm of Hartigan & Hartigan (1985) (AS 217, in the
+form used by the R package diptest) on sorted arrays, so many snapshots or replicas can be
+sorted in one call and evaluated without re-sorting. P-values come from a table of dips of
+uniform samples, which depends only on the sample size and is cached in memory and optionally
+on disk, instead of being simulated again for every call.
+"""
+
+# null distributions by (sample size, number of simulations)
+_null_tables = {}
+
+
+def dip_sorted(x):
+    """
+    Function to compute Hartigan's dip statistic of a sorted sample.
+
+    Arguments
+    ---------
+    x : np.ndarray
+        Sorted 1-d array
+
+    Returns
+    -------
+    (dip, (low, high)) : tuple of float and tuple of ints
+        dip - the dip statistic
+        low, high - indices of the lower and upper end of the modal interval in x
+    """
+    n = len(x)
+    if n < 2 or x[-1] == x[0]:
+        return 0.0, (0, n - 1)
+    # the algorithm is written with 1-based indices, x[0] is a dummy
+    x = [0.0] + x.tolist()
+    mn = [0] * (n + 1)
+    mj = [0] * (n + 1)
+
+    # indices over which combination is necessary for the convex minorant
+    mn[1] = 1
+    for j in range(2, n + 1):
+        mn[j] = j - 1
+        while True:
+            mnj = mn[j]
+            mnmnj = mn[mnj]
+            if mnj == 1 or (x[j] - x[mnj]) * (mnj - mnmnj) < (x[mnj] - x[mnmnj]) * (j - mnj):
+                break
+            mn[j] = mnmnj
+
+    # indices over which combination is necessary for the concave majorant
+    mj[n] = n
+    for k in range(n - 1, 0, -1):
+        mj[k] = k + 1
+        while True:
+            mjk = mj[k]
+            mjmjk = mj[mjk]
+            if mjk == n or (x[k] - x[mjk]) * (mjk - mjmjk) < (x[mjk] - x[mjmjk]) * (k - mjk):
+                break
+            mj[k] = mjmjk
+
+    low, high = 1, n
+    dip = 1.0
+    while True:
+        # change points of the convex minorant from high to low
+        gcm = [0, high]
+        while gcm[-1] > low:
+            gcm.append(mn[gcm[-1]])
+        l_gcm = len(gcm) - 1
+        ig = l_gcm
+        ix = ig - 1
+        # change points of the concave majorant from low to high
+        lcm = [0, low]
+        while lcm[-1] < high:
+            lcm.append(mj[lcm[-1]])
+        l_lcm = len(lcm) - 1
+        ih = l_lcm
+        iv = 2
+
+        # largest distance between the minorant and the majorant
+        d = 0.0
+        if l_gcm != 2 or l_lcm != 2:
+            while True:
+                gcmix = gcm[ix]
+                lcmiv = lcm[iv]
+                if gcmix > lcmiv:
+                    gcmi1 = gcm[ix + 1]
+                    dx = (lcmiv - gcmi1 + 1) - (x[lcmiv] - x[gcmi1]) * (gcmix - gcmi1) / (x[gcmix] - x[gcmi1])
+                    iv += 1
+                    if dx >= d:
+                        d = dx
+                        ig = ix + 1
+                        ih = iv - 1
+                else:
+                    lcmiv1 = lcm[iv - 1]
+                    dx = (x[gcmix] - x[lcmiv1]) * (lcmiv - lcmiv1) / (x[lcmiv] - x[lcmiv1]) - (gcmix - lcmiv1 - 1)
+                    ix -= 1
+                    if dx >= d:
+                        d = dx
+                        ig = ix + 1
+                        ih = iv
+                if ix < 1:
+                    ix = 1
+                if iv > l_lcm:
+                    iv = l_lcm
+                if gcm[ix] == lcm[iv]:
+                    break
+        else:
+            d = 1.0
+
+        if d < dip:
+            break
+
+        # dip of the convex minorant
+        dip_l = 0.0
+        for j in range(ig, l_gcm):
+            max_t = 1.0
+            jb, je = gcm[j + 1], gcm[j]
+            if je - jb > 1 and x[je] != x[jb]:
+                c = (je - jb) / (x[je] - x[jb])
+                for jj in range(jb, je + 1):
+                    t = (jj - jb + 1) - (x[jj] - x[jb]) * c
+                    if max_t < t:
+                        max_t = t
+            if dip_l < max_t:
+                dip_l = max_t
+
+        # dip of the concave majorant
+        dip_u = 0.0
+        for j in range(ih, l_lcm):
+            max_t = 1.0
+            jb, je = lcm[j], lcm[j + 1]
+            if je - jb > 1 and x[je] != x[jb]:
+                c = (je - jb) / (x[je] - x[jb])
+                for jj in range(jb, je + 1):
+                    t = (x[jj] - x[jb]) * c - (jj - jb - 1)
+                    if max_t < t:
+                        max_t = t
+            if dip_u < max_t:
+                dip_u = max_t
+
+        dip = max(dip, dip_l, dip_u)
+        if low == gcm[ig] and high == lcm[ih]:
+            break
+        low = gcm[ig]
+        high = lcm[ih]
+    return dip / (2 * n), (low - 1, high - 1)
+
+
+def dip_statistics(samples):
+    """
+    Function to compute the dip statistic of many samples at once.
+
+    Arguments
+    ---------
+    samples : np.ndarray
+        (k, n) array, e.g. opinions of k snapshots or replicas, or a single 1-d sample
+
+    Returns
+    -------
+    dips : np.ndarray
+        Dip statistic of every sample
+    """
+    samples = np.sort(np.atleast_2d(samples), axis=1)
+    return np.array([dip_sorted(sample)[0] for sample in samples])
+
+
+def null_table(n, numt=1000, cache_dir=None):
+    """
+    Function to get sorted dips of numt uniform samples of size n. Tables are computed once with
+    a fixed seed and cached in memory, and in cache_dir if given.
+    """
+    key = (n, numt)
+    if key in _null_tables:
+        return _null_tables[key]
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, "dip_null_{}_{}.npy".format(n, numt))
+        if os.path.exists(path):
+            _null_tables[key] = np.load(path)
+            return _null_tables[key]
+    rng = np.random.default_rng(n)
+    table = np.sort(dip_statistics(rng.uniform(size=(numt, n))))
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(path, table)
+    _null_tables[key] = table
+    return table
+
+
+def dip_test(samples, numt=1000, cache_dir=None):
+    """
+    Function to compute dip statistics and their p-values for many samples of the same size.
+
+    Arguments
+    ---------
+    samples : np.ndarray
+        (k, n) array or a single 1-d sample
+    numt : int
+        Number of uniform samples in the null table
+    cache_dir : string
+        Directory in which null tables are stored between runs
+
+    Returns
+    -------
+    (dips, pvalues) : tuple of np.ndarray
+        pvalue - fraction of uniform samples with a larger dip, (count + 1) / (numt + 1)
+    """
+    dips = dip_statistics(samples)
+    return dips, dip_pvalues(dips, np.atleast_2d(samples).shape[1], numt, cache_dir)
+
+
+def dip_pvalues(dips, n, numt=1000, cache_dir=None):
+    """
+    Function to look up p-values of dips of samples of size n in the null table, see dip_test.
+    """
+    table = null_table(n, numt, cache_dir)
+    larger = len(table) - np.searchsorted(table, dips, side="right")
+    return (larger + 1) / (numt + 1)
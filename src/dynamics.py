@@ -0,0 +1,114 @@
+import numpy as np
+
+"""
+File contains the update rules of the model written for whole arrays of agents at once.
+They mirror the scalar methods of src/Agent.py and are used by the vectorized engine.
+Functions which take state arrays update them in place.
+"""
+
+
+def attention_decay_factor(attention_delta, population):
+    """
+    Factor by which every attention is multiplied in one step, see Agent.update_attention.
+
+    Arguments
+    ---------
+    attention_delta : float
+        Attention change parameter of the model
+    population : int
+        Population size used to scale the decay
+    """
+    return 1 - 2 * attention_delta / population
+
+
+def decay_attention(attentions, attention_delta, population, steps=1):
+    """
+    Decaying attention of every agent, see Agent.update_attention.
+
+    Arguments
+    ---------
+    attentions : np.ndarray
+        Attentions of the agents
+    attention_delta : float
+        Attention change parameter of the model
+    population : int
+        Population size used to scale the decay
+    steps : float
+        Number of steps of decay applied at once, a fraction for substeps shorter than a step
+    """
+    attentions *= attention_decay_factor(attention_delta, population) ** steps
+
+
+def update_opinions(opinions, attentions, informations, a_min, dt, sd_opinion, rng):
+    """
+    Reformulating opinion of every agent with one Euler step, see Agent.update_opinion.
+
+    Arguments
+    ---------
+    opinions, attentions, informations : np.ndarray
+        State of the agents, opinions are updated in place
+    a_min : float
+        Attention threshold of the model
+    dt : float
+        Length of the time step
+    sd_opinion : float
+        Standard deviation of the opinion noise
+    rng : np.random.Generator
+        Source of the noise
+    """
+    noise = rng.normal(0, sd_opinion, size=opinions.shape)
+    drift = np.power(opinions, 3) - (attentions - a_min) * opinions - informations
+    opinions += (noise - drift) * dt
+
+
+def conflict_free_pairs(active, neighbour):
+    """
+    Function to select interacting pairs which do not share an agent, so that they can be applied
+    together. A pair is kept if both of its agents appear in it for the first time in the order
+    of drawing, i.e. an agent interacts at most once (in its first drawn pair); pairs of isolated
+    agents (neighbour -1) are dropped.
+
+    Arguments
+    ---------
+    active, neighbour : np.ndarray
+        Drawn active agents and their chosen neighbours
+
+    Returns
+    -------
+    (active, neighbour) : tuple
+        Kept pairs, in the order of drawing
+    """
+    valid = neighbour >= 0
+    active, neighbour = active[valid], neighbour[valid]
+    endpoints = np.column_stack((active, neighbour)).ravel()
+    _, first = np.unique(endpoints, return_index=True)
+    is_first = np.zeros(len(endpoints), dtype=bool)
+    is_first[first] = True
+    kept = is_first[0::2] & is_first[1::2]
+    return active[kept], neighbour[kept]
+
+
+def attention_decay_rate(attention_delta, population, dt):
+    """
+    Continuous-time rate of the attention decay, chosen so that over a period of dt
+    attention decays by attention_decay_factor.
+    """
+    return -np.log(attention_decay_factor(attention_delta, population)) / dt
+
+
+def integrate_opinions(opinions, attentions, informations, a_min, dt, sd_opinion, rng, h):
+    """
+    Reformulating opinion of every agent with one Euler-Maruyama substep of length h. The noise
+    has standard deviation sd_opinion * sqrt(dt * h), which for h = dt equals the noise of one
+    update_opinions step, so the diffusion per unit of time is the same for any h.
+
+    Arguments
+    ---------
+    opinions, attentions, informations, a_min, dt, sd_opinion, rng
+        See update_opinions
+    h : float
+        Length of the substep
+    """
+    noise = rng.normal(0, sd_opinion * np.sqrt(dt * h), size=opinions.shape)
+    drift = np.power(opinions, 3) - (attentions - a_min) * opinions - informations
+    opinions += noise - drift * h
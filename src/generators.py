@@ -0,0 +1,144 @@
+import numpy as np
+
+from .Graph import CSRGraph
+
+"""
+File contains generators of the network families of src/Network.py which work directly on numpy
+edge arrays and return a CSRGraph, for populations too large for networkx graphs. Nodes are
+numbered 0..n-1 and all randomness comes from the given numpy.random.Generator. The graphs follow
+the same random models as the networkx generators, but are not the same realizations.
+"""
+
+
+def skip_sample(count, p, rng):
+    """
+    Function to choose every one of count positions independently with probability p by drawing
+    geometric gaps between the chosen positions, which costs O(p * count) instead of O(count).
+
+    Returns
+    -------
+    positions : np.ndarray
+        Sorted chosen positions
+    """
+    if count <= 0 or p <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(count, dtype=np.int64)
+    chunks = []
+    last = -1
+    while last < count:
+        remaining = count - last
+        size = int(remaining * p + 5 * np.sqrt(remaining * p) + 16)
+        positions = last + np.cumsum(rng.geometric(p, size=size))
+        chunks.append(positions[positions < count])
+        last = positions[-1]
+    return np.concatenate(chunks)
+
+
+def triangle_pairs(k):
+    """
+    Function to map positions in the list of all pairs i > j, ordered by i and then j, to the pairs.
+    """
+    i = np.floor((1 + np.sqrt(1 + 8 * k.astype(np.float64))) / 2).astype(np.int64)
+    # rounding of the square root can be off by one for large positions
+    i -= i * (i - 1) // 2 > k
+    i += (i + 1) * i // 2 <= k
+    return i, k - i * (i - 1) // 2
+
+
+def unique_edges(n, sources, targets):
+    """
+    Function to drop self loops and repeated edges.
+    """
+    low = np.minimum(sources, targets)
+    high = np.maximum(sources, targets)
+    keys = np.unique((low * n + high)[low != high])
+    return keys // n, keys % n
+
+
+def random_graph(n, p, rng):
+    """
+    Generating a random (Erdos-Renyi) network, every pair of nodes is connected with probability p.
+    """
+    i, j = triangle_pairs(skip_sample(n * (n - 1) // 2, p, rng))
+    return CSRGraph.from_edges(n, i, j)
+
+
+def ba_graph(n, m, rng):
+    """
+    Generating a Barabasi-Albert network with the algorithm of Batagelj & Brandes (2005).
+
+    Node m starts connected to nodes 0..m-1 and every later node attaches m edges. The edge list
+    is kept as an array of end points in which every node appears once per edge, so a uniformly
+    chosen earlier entry is a node chosen proportionally to its degree. All entries are drawn at
+    once and entries copying the target of an earlier edge are resolved by pointer jumping. Repeated
+    edges of a node are merged, so a few nodes get less than m edges.
+    """
+    if n <= m:
+        return CSRGraph.from_edges(n, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    n_edges = m * (n - m)
+    edge = np.arange(n_edges)
+    sources = m + edge // m
+    # entry 2e is the source of edge e, entry 2e+1 its target, the target of an edge of a node is
+    # copied from the entries before the first edge of that node
+    first = edge - edge % m
+    entries = (rng.random(n_edges) * (2 * first)).astype(np.int64)
+    targets = np.where(entries % 2 == 0, sources[entries // 2], -1)
+    pointers = entries // 2
+    targets[:m] = np.arange(m)
+    pending = np.flatnonzero(targets < 0)
+    while len(pending) > 0:
+        resolved = targets[pointers[pending]]
+        done = resolved >= 0
+        targets[pending[done]] = resolved[done]
+        # the others jump to the entry their pointer points to
+        waiting = pending[~done]
+        pointers[waiting] = pointers[pointers[waiting]]
+        pending = waiting
+    return CSRGraph.from_edges(n, *unique_edges(n, sources, targets))
+
+
+def ws_graph(n, k, p, rng):
+    """
+    Generating a Watts-Strogatz network: a ring in which every node is connected to its k // 2
+    nearest neighbours on each side, every edge then has its far end moved to a uniformly chosen
+    other node with probability p. Repeated edges created by rewiring are merged.
+    """
+    half = k // 2
+    sources = np.repeat(np.arange(n), half)
+    targets = (sources + np.tile(np.arange(1, half + 1), n)) % n
+    rewired = rng.random(len(sources)) < p
+    # uniform choice among the nodes other than the source
+    others = rng.integers(n - 1, size=np.count_nonzero(rewired))
+    others += others >= sources[rewired]
+    targets[rewired] = others
+    return CSRGraph.from_edges(n, *unique_edges(n, sources, targets))
+
+
+def sb_graph(n, n_blocks, p, k, rng):
+    """
+    Generating a stochastic block network of n_blocks blocks of n // n_blocks nodes. Pairs within a
+    block are connected with probability k, pairs from different blocks with probability p, every
+    pair of blocks is sampled with geometric skips.
+    """
+    size = n // n_blocks
+    sources, targets = [], []
+    for a in range(n_blocks):
+        i, j = triangle_pairs(skip_sample(size * (size - 1) // 2, k, rng))
+        sources.append(a * size + i)
+        targets.append(a * size + j)
+        for b in range(a + 1, n_blocks):
+            i, j = np.divmod(skip_sample(size * size, p, rng), size)
+            sources.append(a * size + i)
+            targets.append(b * size + j)
+    return CSRGraph.from_edges(size * n_blocks, np.concatenate(sources), np.concatenate(targets))
+
+
+def lattice(m, n):
+    """
+    Generating a m x n 2d lattice grid, node (i, j) is numbered i * n + j.
+    """
+    nodes = np.arange(m * n).reshape(m, n)
+    sources = np.concatenate((nodes[:, :-1].ravel(), nodes[:-1, :].ravel()))
+    targets = np.concatenate((nodes[:, 1:].ravel(), nodes[1:, :].ravel()))
+    return CSRGraph.from_edges(m * n, sources, targets)
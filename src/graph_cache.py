@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .Graph import CSRGraph
+
+"""
+File contains an on-disk cache of networks in CSR format. Every entry is a directory with
+indptr.npy, indices.npy and, for graphs with non-integer node labels, nodes.npy. Entries are
+keyed by a hash of the generation parameters (and of the content of the edge list file for
+social media graphs) and loaded as read-only memory maps, so a cached graph costs no parsing
+and no copying.
+
+A cache directory keeps at most max_entries graphs, the least recently used ones are removed when
+a new graph is stored. clear_cache removes all of them.
+"""
+
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "hiom", "graphs")
+
+# number of graphs kept in a cache directory, None keeps all of them
+max_entries = 64
+
+# hashes of already read files by (path, modification time, size)
+_file_hashes = {}
+
+
+def file_hash(path):
+    """
+    Function to compute a hash of the content of a file, e.g. of an edge list.
+    """
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo in _file_hashes:
+        return _file_hashes[memo]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    _file_hashes[memo] = digest.hexdigest()
+    return _file_hashes[memo]
+
+
+def cache_key(description):
+    """
+    Function to compute the key of a cache entry from a JSON-serializable description
+    of the graph (generation method, parameters, size, seed or file hash).
+    """
+    text = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def load_graph(key, cache_dir=None):
+    """
+    Function to load a cached graph.
+
+    Returns
+    -------
+    graph : CSRGraph or None
+        The graph with memory mapped arrays, None if it is not in the cache
+    """
+    path = os.path.join(cache_dir or default_cache_dir, key)
+    if not os.path.isdir(path):
+        return None
+    indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+    indices = np.load(os.path.join(path, "indices.npy"), mmap_mode="r")
+    nodes = None
+    nodes_path = os.path.join(path, "nodes.npy")
+    if os.path.exists(nodes_path):
+        nodes = np.load(nodes_path).tolist()
+    # the modification time of the entry marks its last use for the eviction
+    os.utime(path)
+    return CSRGraph(indptr, indices, nodes)
+
+
+def store_graph(key, graph, cache_dir=None):
+    """
+    Function to store a graph in the cache. The entry is written to a temporary directory
+    first and then renamed, so concurrent runs never see a partial entry. Least recently used
+    entries above max_entries are removed afterwards.
+    """
+    cache_dir = cache_dir or default_cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        return
+    tmp = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        np.save(os.path.join(tmp, "indptr.npy"), np.asarray(graph.indptr))
+        np.save(os.path.join(tmp, "indices.npy"), np.asarray(graph.indices))
+        if not isinstance(graph.nodes, range) and list(graph.nodes) != list(range(graph.n)):
+            np.save(os.path.join(tmp, "nodes.npy"), np.array(graph.nodes))
+        os.rename(tmp, path)
+    except OSError:
+        # another process stored the same graph in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+    if max_entries is not None:
+        evict(cache_dir, max_entries)
+
+
+def cache_entries(cache_dir=None):
+    """
+    Function to list the keys of the cached graphs, least recently used first.
+    """
+    cache_dir = cache_dir or default_cache_dir
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for key in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, key)
+        # temporary directories of graphs being stored have no indptr.npy yet
+        if os.path.exists(os.path.join(path, "indptr.npy")):
+            entries.append((os.stat(path).st_mtime_ns, key))
+    return [key for _, key in sorted(entries)]
+
+
+def evict(cache_dir, keep):
+    """
+    Function to remove the least recently used graphs so that at most keep graphs are left.
+    """
+    keys = cache_entries(cache_dir)
+    for key in keys[:max(len(keys) - keep, 0)]:
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+
+
+def clear_cache(cache_dir=None):
+    """
+    Function to remove all graphs from the cache (by default from ~/.cache/hiom/graphs).
+
+    Returns
+    -------
+    removed : int
+        Number of removed graphs
+    """
+    cache_dir = cache_dir or default_cache_dir
+    keys = cache_entries(cache_dir)
+    evict(cache_dir, 0)
+    return len(keys)
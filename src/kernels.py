@@ -0,0 +1,80 @@
+import numpy as np
+
+"""
+File contains the compiled step kernel of the "numba" engine. The whole loop of the model (choice
+of the active agent, choice of the neighbour, interaction, attention decay and opinion update)
+runs for many steps in a single call over the state arrays, with the same update rules as
+src/Agent.py and src/dynamics.py.
+
+numba is optional. If it can not be imported, numba_available is False and HIOM falls back
+to the vectorized engine.
+"""
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+numba_available = numba is not None
+
+
+def jit(function):
+    # without numba the kernel stays a (very slow) Python function
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def run_steps(opinions, attentions, informations, indptr, indices, step_count, dt, attention_delta,
+              persuasion, a_min, r_min, sd_opinion, sd_info, population, seed):
+    """
+    Runs step_count steps of the model in place on the state arrays.
+
+    The kernel draws from the random generator of numba, which is seeded with seed on every
+    call, so a run is reproducible when the seeds come from the generator of the model.
+
+    Returns
+    -------
+    (active, neighbour) : tuple of ints
+        Indices of the agents which interacted in the last step, neighbour is -1 if the
+        active agent had no neighbours
+    """
+    np.random.seed(seed)
+    n = len(opinions)
+    decay = 1 - 2 * attention_delta / population
+    active = -1
+    neighbour = -1
+    for step in range(step_count):
+        # active agent chosen proportionally to attention
+        total = 0.0
+        for i in range(n):
+            total += attentions[i]
+        target = np.random.random() * total
+        active = n - 1
+        cumulative = 0.0
+        for i in range(n):
+            cumulative += attentions[i]
+            if cumulative > target:
+                active = i
+                break
+
+        # interaction with a uniformly chosen neighbour
+        start = indptr[active]
+        degree = indptr[active + 1] - start
+        neighbour = -1
+        if degree > 0:
+            neighbour = indices[start + np.random.randint(0, degree)]
+            attentions[active] += attention_delta * (2 - attentions[active])
+            attentions[neighbour] += attention_delta * (2 - attentions[neighbour])
+            expo = np.exp(-persuasion * (attentions[neighbour] - attentions[active]))
+            r = r_min + (1 - r_min) / (1 + expo)
+            informations[neighbour] = r * informations[neighbour] + (1 - r) * informations[active] \
+                + np.random.normal(0.0, sd_info)
+
+        # attention decay and opinion update of the whole population
+        for i in range(n):
+            attentions[i] *= decay
+            drift = opinions[i] ** 3 - (attentions[i] - a_min) * opinions[i] - informations[i]
+            opinions[i] += (np.random.normal(0.0, sd_opinion) - drift) * dt
+    return active, neighbour
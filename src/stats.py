@@ -1,21 +1,45 @@
-import unidip.dip as dip
 import numpy as np
 
+from .dip import dip_sorted, dip_test, dip_pvalues
+
 """
 File contains three methods to quantify the polarization within the population. 
 1. Hartigan's D test (which is increasing when the distribution is less similar to unimodal distribution)
 2. Fraction of the population holding a view in accordance with the minority.
 3. Mean opinion. 
+
+A single step can be passed either as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ],
+or as a plain array of opinions, e.g. a row of a trajectory recorded on disk.
 """
 
+def raw_values(snapshot):
+    """
+    Function to extract values of a single step regardless of its format.
+
+    Arguments
+    ---------
+    snapshot : [ float ] or np.ndarray
+        Either [[id, value], ...] pairs as collected by the data_collector or a 1-d array of values
+
+    Returns
+    -------
+    values : np.ndarray
+        1-d array of the values
+    """
+    values = np.asarray(snapshot, dtype=np.float64)
+    if values.ndim == 2:
+        values = values[:, 1]
+    return values
+
 def compute_hartigan_opinions(opinion):
     """
     Function to compute Hartigan's Dip test of unimodality in distribution of opinions in a selected step.
 
     Arguments
     ---------
-    opinion : [ float ]
-        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ]
+    opinion : [ float ] or np.ndarray
+        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ],
+        or an array of opinions
 
     Returns
     -------
@@ -26,10 +50,29 @@ def compute_hartigan_opinions(opinion):
         pvalue - P-value specifying the similarity of the distribution to an unimodal distribution. In short: 
         The smaller the value, the more likely it is that the distribution is not unimodal.
         indices - left and center indices of the dip
+        The p-value is looked up in a cached table of dips of uniform samples, see src/dip.py.
     """
 
-    raw_opinions = [x[1] for x in opinion]
-    return dip.diptst(raw_opinions)
+    raw_opinions = np.sort(raw_values(opinion))
+    d, indices = dip_sorted(raw_opinions)
+    pvalue = dip_pvalues(d, len(raw_opinions))
+    return d, pvalue, indices
+
+def compute_hartigan_batch(opinions):
+    """
+    Function to compute Hartigan's Dip test for many steps or replicas at once.
+
+    Arguments
+    ---------
+    opinions : np.ndarray
+        (k, N) array of opinions, e.g. a recorded trajectory or Ensemble.opinions
+
+    Returns
+    -------
+    (dips, pvalues) : tuple of np.ndarray
+        Dip statistic and p-value of every row, see compute_hartigan_opinions
+    """
+    return dip_test(np.asarray(opinions, dtype=np.float64))
 
 def compute_fractions_size(opinion):
     """
@@ -37,8 +80,9 @@ def compute_fractions_size(opinion):
 
     Arguments
     ---------
-    opinion : [ float ]
-        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ]
+    opinion : [ float ] or np.ndarray
+        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ],
+        or an array of opinions
 
     Returns
     -------
@@ -48,9 +92,9 @@ def compute_fractions_size(opinion):
         n_plus - number of agents with opion > 0.0
         n_minus - number of agents with opion <= 0.0 
     """
-    raw_opinions = [x[1] for x in opinion]
-    n_minus = np.sum([o <= 0.0 for o in raw_opinions])
-    n_plus = np.sum([o > 0.0 for o in raw_opinions])
+    raw_opinions = raw_values(opinion)
+    n_plus = np.count_nonzero(raw_opinions > 0.0)
+    n_minus = len(raw_opinions) - n_plus
     return n_plus/len(raw_opinions), n_plus, n_minus
 
 def compute_mean_opinion(opinion):
@@ -59,8 +103,9 @@ def compute_mean_opinion(opinion):
 
     Arguments
     ---------
-    opinion : [ float ]
-        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ]
+    opinion : [ float ] or np.ndarray
+        Series of opinions defined as output of the data_collector, i.e., [[1, 0.5], [2, 0.2], ... ],
+        or an array of opinions
 
     Returns
     -------
@@ -68,5 +113,5 @@ def compute_mean_opinion(opinion):
         mean - average value of the opinions passed in the parameter
         stdev - standard deviation of the opinions passed in the parameter
     """
-    raw_opinions = [x[1] for x in opinion]
+    raw_opinions = raw_values(opinion)
     return np.mean(raw_opinions), np.std(raw_opinions)
\ No newline at end of file
@@ -0,0 +1,367 @@
+import copy
+import inspect
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.Model import HIOM, spawn_seeds
+from src.Ensemble import Ensemble
+from src.Network import Network
+from src.OnlineStats import OnlineStats
+from src.Profiler import Profiler
+from src.SharedArrays import SharedArrays, attach, attach_graph, share_graph
+from src.stats import compute_hartigan_opinions, compute_hartigan_batch
+from scenarios.test import agents as default_agents
+
+"""
+File contains the parameter sweep runner. A grid of parameter values is expanded into independent
+model runs, which are executed in a pool of processes. Every run gets its own seed derived from a
+single root seed, and the results are collected into a tidy table (one row per run and recorded step).
+
+Networks which are the same in every run (social media and lattice graphs, or generated graphs with
+a "seed" in network_params) are built once and shared with the workers in shared memory
+(src/SharedArrays.py), and the workers write their statistics into shared result buffers.
+"""
+
+# HIOM parameters which do not apply to an Ensemble (all replicas are updated with array operations
+# and only the final step is kept) and are left out of ensemble runs
+ensemble_ignored = ("engine", "selection", "recorder_params", "headless")
+
+
+def expand_grid(grid, base_params=None, repetitions=1):
+    """
+    Function to expand a parameter grid into a list of runs.
+
+    Arguments
+    ---------
+    grid : dict
+        Maps names of HIOM parameters to lists of tested values, e.g. {"persuasion": [0.1, 1]}
+    base_params : dict or [ dict ]
+        Parameters shared by all runs. If a list is passed, every combination of the grid
+        is run with each of the dictionaries (identified by "config" in the results).
+    repetitions : int
+        Number of repetitions of every combination
+
+    Returns
+    -------
+    runs : [ dict ]
+        Description of the runs with fields "params" (a fresh copy of the model parameters),
+        "point" (values of the grid parameters), "repetition" and "config"
+    """
+    if base_params is None:
+        base_params = {}
+    if isinstance(base_params, dict):
+        base_params = [base_params]
+    names = list(grid)
+    runs = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        point = dict(zip(names, values))
+        for repetition in range(repetitions):
+            for config, base in enumerate(base_params):
+                params = copy.deepcopy(base)
+                params.update(point)
+                runs.append({
+                    "params": params,
+                    "point": point,
+                    "repetition": repetition,
+                    "config": config
+                })
+    return runs
+
+
+def run_sweep(grid, stat_functions, base_params=None, repetitions=1, step_count=500,
+              record_every=None, agents=default_agents, processes=None, seed=None, ensemble=False,
+              stopping=None, start=None, profile=False, cache_run_graphs=False):
+    """
+    Function to run all combinations of a parameter grid in a pool of processes.
+
+    Arguments
+    ---------
+    grid, base_params, repetitions
+        See expand_grid
+    stat_functions : dict
+        Maps column names to statistic functions from src/stats.py. The first element of the
+        returned tuple is stored. Functions have to be picklable (defined at module level).
+    step_count : int or function
+        Number of steps of every run, or a function computing it from the model parameters,
+        e.g. lambda params: int(300 / params["persuasion"])
+    record_every : int
+        If None, statistics are computed only at the final step, otherwise every k-th step
+    agents : [ dict ]
+        Agent types passed to HIOM. recorder_params of the runs are always set by the sweep.
+    processes : int
+        Number of worker processes, None uses all cores, 1 runs everything in this process
+    seed : int
+        Root seed from which independent seeds of all runs are derived
+    ensemble : bool
+        If True, the repetitions of every combination are run together as one Ensemble
+        (sharing a network) instead of separate HIOM runs. Only final statistics are supported.
+    stopping : dict
+        Stopping criteria passed to HIOM.run_model, step_count is then the maximum number of steps.
+        The results get the columns "stop_reason" and "stop_step".
+    start : string
+        Path of a checkpoint saved by HIOM.save, e.g. an equilibrated state. Every run then branches
+        from it with its own parameters and seed (see HIOM.load) instead of a new population,
+        steps are counted from the checkpoint.
+    profile : bool
+        If True, every run is profiled (see HIOM profile) and the results get columns "time_<phase>"
+        with the seconds spent in every phase of the run, see profile_summary.
+    cache_run_graphs : bool
+        Generated graphs without a "seed" in network_params are different in every run, so they
+        are not written to the graph cache (src/graph_cache.py) even with "cache" in network_params,
+        unless this is True (e.g. to repeat the same sweep with the same root seed).
+
+    Returns
+    -------
+    results : pd.DataFrame
+        One row per run and recorded step with columns "run", "config", "repetition", the grid
+        parameters, "seed", "step" and one column per statistic
+    """
+    if ensemble and record_every is not None:
+        raise ValueError("Ensemble sweeps record only the final step")
+    if ensemble and stopping is not None:
+        raise ValueError("Ensemble sweeps do not support early stopping")
+    if ensemble and start is not None:
+        raise ValueError("Ensemble sweeps can not start from a checkpoint")
+    if ensemble and profile:
+        raise ValueError("Ensemble sweeps can not be profiled")
+    runs = expand_grid(grid, base_params, 1 if ensemble else repetitions)
+    if ensemble:
+        # other HIOM parameters (e.g. interactions_per_step or online_stats) are rejected
+        # before any run is started instead of failing in the workers
+        accepted = set(inspect.signature(Ensemble).parameters) | set(ensemble_ignored)
+        unsupported = sorted({name for run in runs for name in run["params"]} - accepted)
+        if unsupported:
+            raise ValueError("Ensemble sweeps do not support the parameters: " + ", ".join(unsupported))
+    seeds = spawn_seeds(seed, len(runs))
+    if processes is None:
+        processes = os.cpu_count()
+    population = sum(atype["n"] for atype in agents)
+
+    # networks and result buffers are shared with the workers instead of being
+    # built by every run and sent back pickled, the blocks are released on exit
+    with SharedArrays(enabled=processes != 1) as arrays:
+        graphs = {}
+        tasks = []
+        offset = 0
+        for i, run in enumerate(runs):
+            steps = step_count(run["params"]) if callable(step_count) else step_count
+            if ensemble:
+                rows = repetitions
+            elif record_every:
+                rows = steps // record_every + 1
+            else:
+                rows = 1
+            network_params = run["params"].get("network_params") if start is None else None
+            tasks.append(dict(
+                run,
+                run=i,
+                seed=seeds[i],
+                step_count=steps,
+                record_every=record_every,
+                stopping=stopping,
+                start=start,
+                profile=profile,
+                stat_functions=stat_functions,
+                agents=agents,
+                replicas=repetitions,
+                graph=shared_network(arrays, graphs, network_params, population),
+                cache_run_graphs=cache_run_graphs,
+                offset=offset
+            ))
+            offset += rows
+
+        # without shared memory, workers send their results back
+        buffers = None
+        if arrays.enabled or processes == 1:
+            result_steps, steps_descriptor = arrays.create(offset, np.int64)
+            result_values, values_descriptor = arrays.create((offset, len(stat_functions)), np.float64)
+            counts, counts_descriptor = arrays.create(len(tasks), np.int64, fill=0)
+            buffers = {"steps": steps_descriptor, "values": values_descriptor, "counts": counts_descriptor}
+        for task in tasks:
+            task["buffers"] = buffers
+
+        task_function = run_ensemble_task if ensemble else run_task
+        if processes == 1:
+            results = [task_function(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(task_function, tasks))
+
+        index, repetition, steps, values, extras = [], [], [], [], []
+        for task, (task_steps, task_values, task_extras) in zip(tasks, results):
+            if task_steps is None:
+                rows = slice(task["offset"], task["offset"] + counts[task["run"]])
+                task_steps, task_values = result_steps[rows], result_values[rows]
+            index += [task["run"]] * len(task_steps)
+            # the rows of an ensemble are its replicas
+            repetition += list(range(len(task_steps))) if ensemble else [task["repetition"]] * len(task_steps)
+            steps.append(np.array(task_steps))
+            values.append(np.array(task_values))
+            extras.append(task_extras)
+    steps = np.concatenate(steps)
+    values = np.concatenate(values)
+
+    columns = {
+        "run": index,
+        "config": [tasks[i]["config"] for i in index],
+        "repetition": repetition
+    }
+    for name in grid:
+        columns[name] = [tasks[i]["point"][name] for i in index]
+    columns["seed"] = [tasks[i]["seed"] for i in index]
+    columns["step"] = steps
+    for j, name in enumerate(stat_functions):
+        columns[name] = values[:, j]
+    extra_columns = []
+    if stopping is not None:
+        extra_columns += ["stop_reason", "stop_step"]
+    if profile:
+        extra_columns += ["time_" + phase for phase in Profiler.phases]
+    for name in extra_columns:
+        columns[name] = [extras[i][name] for i in index]
+    return pd.DataFrame(columns, columns=list(columns))
+
+
+def shared_network(arrays, graphs, network_params, population):
+    # networks which are the same in every run (not generated from the seed of the run)
+    # are built once and shared with the workers
+    if network_params is None:
+        return None
+    if network_params["method"] in Network.seeded_methods and network_params.get("seed") is None:
+        return None
+    key = json.dumps(network_params, sort_keys=True, default=str)
+    if key not in graphs:
+        network = Network(params=network_params, n=population)
+        graphs[key] = share_graph(arrays, network.get_csr())
+    return graphs[key]
+
+
+def run_network_params(task):
+    # graphs generated from the seed of the run are used only once and kept out of the graph cache
+    network_params = task["params"].get("network_params")
+    if network_params is None or task["cache_run_graphs"] or task["graph"] is not None:
+        return network_params
+    if network_params["method"] not in Network.seeded_methods or network_params.get("seed") is not None:
+        return network_params
+    return {name: value for name, value in network_params.items() if name != "cache"}
+
+
+def store_results(task, steps, values, extras):
+    # results are written into the shared buffers of the sweep, only the extras travel back
+    steps = np.asarray(steps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(steps), -1)
+    buffers = task["buffers"]
+    if buffers is None:
+        return steps, values, extras
+    rows = slice(task["offset"], task["offset"] + len(steps))
+    attach(buffers["steps"])[rows] = steps
+    attach(buffers["values"])[rows] = values
+    attach(buffers["counts"])[task["run"]] = len(steps)
+    return None, None, extras
+
+
+def run_task(task):
+    # a single model run executed by a worker process
+    params = dict(task["params"])
+    params["seed"] = task["seed"]
+    if "network_params" in params:
+        params["network_params"] = run_network_params(task)
+    # runs of a sweep never use the mesa layer unless the agent engine asks for it
+    params.setdefault("headless", True)
+    if task["profile"]:
+        params["profile"] = True
+    if task["graph"] is not None:
+        params["graph"] = attach_graph(task["graph"])
+    step_count = task["step_count"]
+    every = task["record_every"]
+    stat_functions = task["stat_functions"]
+    # statistics over time are computed while running when possible,
+    # otherwise only the snapshots needed for them are kept in memory
+    online = every and all(f in OnlineStats.stat_columns for f in stat_functions.values())
+    if online:
+        params["online_stats"] = {"every": every}
+    if online or not every:
+        params["recorder_params"] = {"method": "array", "every": max(step_count, 1)}
+    else:
+        params["recorder_params"] = {"method": "array", "every": every}
+    if task["start"] is None:
+        model = HIOM(task["agents"], **params)
+    else:
+        model = HIOM.load(task["start"], **params)
+    start_step = model.steps
+    model.run_model(step_count, task["stopping"])
+    # workers of the partitioned engine are stopped, the state stays readable
+    model.close()
+
+    if online:
+        steps = model.online_stats.steps
+        snapshots = range(len(steps))
+        series = {name: model.online_stats.series(f) for name, f in stat_functions.items()}
+    else:
+        if every:
+            collected = model.data_collector.get_model_vars_dataframe()["Opinion"]
+            steps = model.data_collector.steps()
+            snapshots = range(len(steps))
+        else:
+            # only the final state is needed, which may be before the budget if the run stopped early
+            collected = {0: model.opinions}
+            steps = [model.steps - start_step]
+            snapshots = [0]
+        series = {}
+        for name, stat_function in stat_functions.items():
+            if stat_function is compute_hartigan_opinions and every:
+                # dips of all snapshots are evaluated in one batch
+                dips, _ = compute_hartigan_batch(collected.values[list(snapshots)])
+                series[name] = dict(zip(snapshots, dips))
+            else:
+                series[name] = {i: stat_function(collected[i])[0] for i in snapshots}
+    values = [[series[name][i] for name in stat_functions] for i in snapshots]
+    extras = {}
+    if task["stopping"] is not None:
+        extras["stop_reason"] = model.stop_reason
+        extras["stop_step"] = model.stop_step
+    if task["profile"]:
+        for phase in Profiler.phases:
+            extras["time_" + phase] = model.profiler.times.get(phase, 0.0)
+    return store_results(task, steps, values, extras)
+
+
+def run_ensemble_task(task):
+    # all repetitions of a single combination run as one ensemble by a worker process
+    params = {name: value for name, value in task["params"].items() if name not in ensemble_ignored}
+    params["seed"] = task["seed"]
+    if "network_params" in params:
+        params["network_params"] = run_network_params(task)
+    if task["graph"] is not None:
+        params["graph"] = attach_graph(task["graph"])
+    model = Ensemble(task["replicas"], task["agents"], **params)
+    model.run_model(task["step_count"])
+
+    results = {name: model.stats(stat_function) for name, stat_function in task["stat_functions"].items()}
+    values = [[results[name][replica][0] for name in task["stat_functions"]] for replica in range(task["replicas"])]
+    return store_results(task, [model.steps] * task["replicas"], values, {})
+
+
+def profile_summary(results):
+    """
+    Function to aggregate the phase times of a profiled sweep (run_sweep(..., profile=True)).
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        Indexed by phase, with the total seconds over all runs, the mean seconds per run
+        and the share of every phase in the total
+    """
+    runs = results.drop_duplicates("run")
+    columns = ["time_" + phase for phase in Profiler.phases]
+    summary = pd.DataFrame({
+        "seconds": runs[columns].sum().values,
+        "per_run": runs[columns].mean().values
+    }, index=pd.Index(Profiler.phases, name="phase"))
+    summary["share"] = summary["seconds"] / summary["seconds"].sum()
+    return summary
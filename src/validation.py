@@ -0,0 +1,120 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy import stats as scipy_stats
+
+from src.sweep import run_sweep
+from src.stats import raw_values, compute_fractions_size, compute_mean_opinion
+
+"""
+File contains checks of the statistical equivalence of the engines of HIOM. Engines use different
+random streams, so single runs differ; instead, distributions of final statistics over many
+seeded runs of every engine are compared with the reference "agent" engine. In the same way steps
+with several interactions are compared with one interaction per step.
+"""
+
+
+def compute_opinion_variance(opinions):
+    """
+    Function to compute variance of the opinions, in the (value, ) format of src/stats.py.
+    """
+    return (float(np.var(raw_values(opinions))), )
+
+
+# final statistics compared by the Kolmogorov-Smirnov tests
+stat_functions = {"mean": compute_mean_opinion,
+                  "fraction": compute_fractions_size,
+                  "variance": compute_opinion_variance}
+
+
+def compare_engines(engines=("vectorized", "numba"), reference="agent", runs=30, step_count=500,
+                    params=None, processes=None, seed=0):
+    """
+    Function to compare final statistics of engines with the reference engine.
+
+    Arguments
+    ---------
+    engines : [ string ]
+        Engines compared with the reference
+    reference : string
+        Engine taken as the reference implementation
+    runs : int
+        Number of seeded runs of every engine
+    step_count : int
+        Number of steps of every run
+    params : dict
+        Further HIOM parameters shared by all runs
+    processes, seed
+        See src/sweep.py run_sweep
+
+    Returns
+    -------
+    comparison : pd.DataFrame
+        One row per engine and statistic with the mean and standard deviation of the statistic
+        over the runs and the p-value of a two-sample Kolmogorov-Smirnov test against the reference.
+        Small p-values (e.g. < 0.01) indicate that the engine does not reproduce the reference.
+    """
+    results = run_sweep(
+        {"engine": [reference] + list(engines)},
+        stat_functions,
+        base_params=params,
+        repetitions=runs,
+        step_count=step_count,
+        processes=processes,
+        seed=seed
+    )
+    return compare_results(results, "engine", [reference] + list(engines))
+
+
+def compare_batched(interactions=(2, 3, 5), runs=30, step_count=500, params=None, processes=None, seed=0):
+    """
+    Function to compare final statistics of the vectorized engine with several interactions per
+    step (see HIOM interactions_per_step) with one interaction per step. Every run covers the
+    same simulated time, i.e. step_count / K steps of K interactions. A single opinion update
+    of K * dt per step diverges for larger K, which are compared with an opinion_step in params.
+
+    Arguments
+    ---------
+    interactions : [ int ]
+        Interactions per step compared with one interaction per step
+    runs, step_count, params, processes, seed
+        See compare_engines, step_count is the number of steps with one interaction
+
+    Returns
+    -------
+    comparison : pd.DataFrame
+        As compare_engines, with a row per number of interactions and statistic
+    """
+    values = [1] + list(interactions)
+    results = run_sweep(
+        {"interactions_per_step": values},
+        stat_functions,
+        base_params=dict(params or {}, engine="vectorized"),
+        repetitions=runs,
+        step_count=partial(batched_step_count, step_count),
+        processes=processes,
+        seed=seed
+    )
+    return compare_results(results, "interactions_per_step", values)
+
+
+def batched_step_count(step_count, params):
+    return max(step_count // params["interactions_per_step"], 1)
+
+
+def compare_results(results, column, values):
+    # Kolmogorov-Smirnov tests of the runs of every value of the column against the first one
+    expected = results[results[column] == values[0]]
+    rows = []
+    for value in values:
+        runs = results[results[column] == value]
+        for name in stat_functions:
+            rows.append({
+                column: value,
+                "statistic": name,
+                "mean": runs[name].mean(),
+                "std": runs[name].std(),
+                "pvalue": scipy_stats.ks_2samp(runs[name], expected[name]).pvalue
+            })
+    return pd.DataFrame(rows)
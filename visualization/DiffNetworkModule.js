@@ -0,0 +1,133 @@
+var DiffNetworkModule = function(canvas_width, canvas_height) {
+
+    // Two stacked canvases: the edges are drawn once per model, the nodes on every update
+    var container = $("<div style='position:relative; width:" + canvas_width + "px; height:" + canvas_height + "px; " +
+        "border:1px dotted'></div>");
+    var canvas_tag = "<canvas width='" + canvas_width + "' height='" + canvas_height + "' " +
+        "style='position:absolute; left:0; top:0'></canvas>";
+    var edge_canvas = $(canvas_tag)[0];
+    var node_canvas = $(canvas_tag)[0];
+    container.append(edge_canvas, node_canvas);
+    $("#elements").append(container);
+    var edge_context = edge_canvas.getContext("2d");
+    var node_context = node_canvas.getContext("2d");
+
+    var tooltip = d3.select("body").append("div")
+        .attr("class", "tooltip")
+        .style("opacity", 0);
+
+    var radius = 3;
+    var n = 0;
+    var palette = [];
+    var x = [];
+    var y = [];
+    var color = [];
+    var state = [];
+
+    var layout = function(edges) {
+        var nodes = [];
+        for (var i = 0; i < n; i++) {
+            nodes.push({});
+        }
+        var links = [];
+        for (var k = 0; k < edges.length; k += 2) {
+            links.push({source: edges[k], target: edges[k + 1]});
+        }
+        var simulation = d3.forceSimulation(nodes)
+            .force("charge", d3.forceManyBody()
+                .strength(-80)
+                .distanceMin(2))
+            .force("link", d3.forceLink(links))
+            .force("center", d3.forceCenter())
+            .stop();
+        for (var t = 0, ticks = Math.ceil(Math.log(simulation.alphaMin()) / Math.log(1 - simulation.alphaDecay())); t < ticks; ++t) {
+            simulation.tick();
+        }
+
+        // positions are scaled to fit the canvas
+        var x_min = d3.min(nodes, function(d) { return d.x; });
+        var x_max = d3.max(nodes, function(d) { return d.x; });
+        var y_min = d3.min(nodes, function(d) { return d.y; });
+        var y_max = d3.max(nodes, function(d) { return d.y; });
+        var scale = Math.min((canvas_width - 2 * radius) / Math.max(x_max - x_min, 1),
+                             (canvas_height - 2 * radius) / Math.max(y_max - y_min, 1));
+        x = nodes.map(function(d) { return radius + (d.x - x_min) * scale; });
+        y = nodes.map(function(d) { return radius + (d.y - y_min) * scale; });
+    };
+
+    var drawEdges = function(edges) {
+        edge_context.clearRect(0, 0, canvas_width, canvas_height);
+        edge_context.strokeStyle = "#e6e6e6";
+        edge_context.lineWidth = 1;
+        edge_context.beginPath();
+        for (var k = 0; k < edges.length; k += 2) {
+            edge_context.moveTo(x[edges[k]], y[edges[k]]);
+            edge_context.lineTo(x[edges[k + 1]], y[edges[k + 1]]);
+        }
+        edge_context.stroke();
+    };
+
+    var drawNodes = function() {
+        node_context.clearRect(0, 0, canvas_width, canvas_height);
+        for (var i = 0; i < n; i++) {
+            node_context.fillStyle = palette[color[i]];
+            node_context.beginPath();
+            node_context.arc(x[i], y[i], radius, 0, 2 * Math.PI);
+            node_context.fill();
+        }
+    };
+
+    this.render = function(data) {
+        if (data.type === "topology") {
+            n = data.n;
+            palette = data.palette;
+            color = new Array(n);
+            state = new Array(n);
+            layout(data.edges);
+            drawEdges(data.edges);
+        } else if (n === 0) {
+            // updates before the topology can not be drawn
+            return;
+        }
+        var nodes = data.nodes;
+        for (var k = 0; k < nodes.index.length; k++) {
+            var i = nodes.index[k];
+            color[i] = nodes.color[k];
+            state[i] = [nodes.attention[k], nodes.information[k], nodes.opinion[k]];
+        }
+        if (nodes.index.length > 0 || data.type === "topology") {
+            drawNodes();
+        }
+    };
+
+    this.reset = function() {
+        n = 0;
+        edge_context.clearRect(0, 0, canvas_width, canvas_height);
+        node_context.clearRect(0, 0, canvas_width, canvas_height);
+    };
+
+    // tooltip of the node under the mouse, values are the last sent ones
+    node_canvas.addEventListener("mousemove", function(event) {
+        var rect = node_canvas.getBoundingClientRect();
+        var mouse_x = event.clientX - rect.left;
+        var mouse_y = event.clientY - rect.top;
+        var nearest = -1;
+        var best = (radius + 2) * (radius + 2);
+        for (var i = 0; i < n; i++) {
+            var distance = (x[i] - mouse_x) * (x[i] - mouse_x) + (y[i] - mouse_y) * (y[i] - mouse_y);
+            if (distance < best) {
+                best = distance;
+                nearest = i;
+            }
+        }
+        if (nearest < 0) {
+            tooltip.style("opacity", 0);
+            return;
+        }
+        tooltip.html("id: " + (nearest + 1) + " | A: " + state[nearest][0] + " | I: " + state[nearest][1] +
+                " | O: " + state[nearest][2])
+            .style("left", event.pageX + "px")
+            .style("top", event.pageY + "px")
+            .style("opacity", .9);
+    });
+};
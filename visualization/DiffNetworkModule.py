@@ -0,0 +1,123 @@
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement, ModularServer, SocketHandler
+from matplotlib import cm, colors
+
+
+def color_index(opinions):
+    """
+    Function to map opinions to entries of a 255 colour lookup table, opinions are clipped to [-1, 1].
+    The entries are the same as the colours of a 255 entry matplotlib colormap at (opinion + 1) / 2.
+    """
+    intensity = (np.clip(opinions, -1, 1) + 1) / 2
+    return np.minimum((intensity * 255).astype(np.int64), 254)
+
+
+class DiffNetworkModule(VisualizationElement):
+    """
+    Network view sending the topology once and afterwards only the nodes which changed.
+
+    On the first render of a model for a client the edges (taken from the CSR arrays of the model,
+    so the networkx graph is not needed), a 255 entry colour palette and the state of all nodes
+    are sent. Every later render sends only the nodes whose opinion, attention or information
+    moved by at least threshold since it was last sent to that client, as their palette index and
+    rounded state for the tooltip. The browser part (DiffNetworkModule.js) lays the graph out once
+    and redraws the nodes on a canvas.
+
+    What was sent is kept per client, so it has to be rendered by DiffModularServer, which passes
+    the connection of the client; the plain ModularServer works for a single browser.
+
+    Attributes
+    ----------
+    threshold : float
+        Smallest change of a displayed value which is sent, default is one step of the palette
+    palette : [ string ]
+        Hex colours of the lookup table
+
+    Methods
+    -------
+    render : dict
+        Returns the topology or the changed nodes for the given client
+    forget : None
+        Drops the state of a disconnected client
+    """
+    package_includes = ["d3.min.js"]
+    local_includes = ["DiffNetworkModule.js"]
+    # state arrays of the model shown in the browser
+    quantities = ("opinions", "attentions", "informations")
+
+    def __init__(self, canvas_width=500, canvas_height=500, threshold=2 / 255, cmap="jet"):
+        self.threshold = threshold
+        self.palette = [colors.rgb2hex(color) for color in cm.get_cmap(cmap, 255)(np.arange(255))]
+        self.js_code = "elements.push(new DiffNetworkModule({}, {}));".format(canvas_width, canvas_height)
+        # model and last sent values of every client
+        self.clients = {}
+
+    def render(self, model, client=None):
+        state = self.clients.get(client)
+        if state is None or state["model"] is not model:
+            # a new client or model (start or reset of the server), the topology is sent
+            self.clients[client] = {
+                "model": model,
+                "sent": {name: getattr(model, name).copy() for name in self.quantities}
+            }
+            graph = model.graph
+            sources = np.repeat(np.arange(graph.n), np.diff(graph.indptr))
+            targets = np.asarray(graph.indices)
+            upper = sources < targets
+            edges = np.column_stack((sources[upper], targets[upper])).ravel()
+            return {
+                "type": "topology",
+                "n": graph.n,
+                "edges": edges.tolist(),
+                "palette": self.palette,
+                "nodes": self.node_states(model, np.arange(graph.n))
+            }
+        sent = state["sent"]
+        moved = np.zeros(len(model.opinions), dtype=bool)
+        for name in self.quantities:
+            moved |= np.abs(getattr(model, name) - sent[name]) >= self.threshold
+        changed = np.flatnonzero(moved)
+        for name in self.quantities:
+            sent[name][changed] = getattr(model, name)[changed]
+        return {"type": "delta", "nodes": self.node_states(model, changed)}
+
+    def forget(self, client):
+        self.clients.pop(client, None)
+
+    def node_states(self, model, indices):
+        return {
+            "index": indices.tolist(),
+            "color": color_index(model.opinions[indices]).tolist(),
+            "opinion": np.round(model.opinions[indices], 2).tolist(),
+            "attention": np.round(model.attentions[indices], 2).tolist(),
+            "information": np.round(model.informations[indices], 2).tolist()
+        }
+
+
+class DiffSocketHandler(SocketHandler):
+    """
+    Websocket of one browser, renders the model for this connection.
+    """
+    @property
+    def viz_state_message(self):
+        return {"type": "viz_state", "data": self.application.render_model(self)}
+
+    def on_close(self):
+        for element in self.application.visualization_elements:
+            if isinstance(element, DiffNetworkModule):
+                element.forget(self)
+
+
+class DiffModularServer(ModularServer):
+    """
+    ModularServer keeping the state of DiffNetworkModule elements per browser connection,
+    so every client gets the topology first and then the changes since its own last update.
+    """
+    socket_handler = (r"/ws", DiffSocketHandler)
+    handlers = [ModularServer.page_handler, socket_handler, ModularServer.static_handler,
+                ModularServer.local_handler]
+
+    def render_model(self, client=None):
+        return [element.render(self.model, client) if isinstance(element, DiffNetworkModule)
+                else element.render(self.model)
+                for element in self.visualization_elements]